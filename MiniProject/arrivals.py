@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+Recorded arrival traces for the traffic controller.
+
+A trace holds, for every step, whether a car arrives at each of the four
+entrances. It is stored as one bit per (step, entrance), packed with
+numpy.packbits, after a small header:
+
+    magic "ARV1", entrances, steps, seed, chance of each entrance (percent)
+
+so 1M steps take 500 kB and the file can be memory-mapped instead of read.
+Traces are generated in bulk from the J*_CHANCE values (or recorded from a run
+with TraceWriter), and replayed by traffic.py, models.py and bench.py, which
+makes runs exactly reproducible and removes the random.choices calls from the
+loop: replay() unpacks a chunk of steps at a time, so each step costs one
+iteration over a list of tuples.
+
+Usage:
+    python3 arrivals.py generate -o trace.arv --steps 100000 --seed 1
+    python3 arrivals.py generate -o trace.arv --steps 100000 --chances-from v6/traffic.py
+    python3 arrivals.py info trace.arv
+"""
+
+import argparse
+import re
+import struct
+
+import numpy as np
+
+MAGIC = b"ARV1"
+HEADER = struct.Struct("<4sBQq4B") # magic, entrances, steps, seed, chances
+ENTRANCES = 4
+CHANCES = (30, 70, 60, 50) # J1_CHANCE to J4_CHANCE of v6
+CHUNK = 65536 # Steps unpacked at a time when replaying
+
+
+def generate(steps, chances=CHANCES, seed=0):
+    """
+    Returns a (steps, 4) uint8 array with a 1 where a car arrives at an
+    entrance, each entrance with its chance in percent.
+    """
+    rng = np.random.default_rng(seed)
+    return (rng.random((steps, ENTRANCES)) * 100 < np.asarray(chances)).astype(np.uint8)
+
+
+def chances_from(filename):
+    """
+    Reads J1_CHANCE to J4_CHANCE from a traffic.py.
+    """
+    with open(filename) as f:
+        text = f.read()
+    chances = []
+    for j in range(1, ENTRANCES + 1):
+        match = re.search(rf"^J{j}_CHANCE\s*=\s*(\d+)", text, re.MULTILINE)
+        if not match:
+            raise ValueError(f"J{j}_CHANCE not found in {filename}")
+        chances.append(int(match.group(1)))
+    return tuple(chances)
+
+
+def save(filename, trace, chances=(0, 0, 0, 0), seed=-1):
+    """
+    Writes a (steps, 4) array of arrivals. seed -1 means "not generated".
+    """
+    trace = np.asarray(trace, dtype=np.uint8)
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, ENTRANCES, len(trace), seed, *chances))
+        f.write(np.packbits(trace.ravel()).tobytes())
+
+
+class Trace:
+    """
+    A trace file, memory-mapped. len() is the number of steps, slicing returns
+    the unpacked (steps, 4) array.
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            magic, entrances, steps, seed, *chances = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or entrances != ENTRANCES:
+            raise ValueError(f"{filename}: not an arrival trace")
+        self.steps = steps
+        self.seed = seed
+        self.chances = tuple(chances)
+        nbytes = (steps * ENTRANCES + 7) // 8
+        if nbytes:
+            self.bits = np.memmap(filename, dtype=np.uint8, mode="r", offset=HEADER.size, shape=(nbytes,))
+        else:
+            self.bits = np.zeros(0, dtype=np.uint8) # an empty file cannot be mapped
+
+    def __len__(self):
+        return self.steps
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, stride = index.indices(self.steps)
+        else:
+            start = index + self.steps if index < 0 else index
+            if not 0 <= start < self.steps:
+                raise IndexError(f"step {index} out of range for a trace of {self.steps} steps")
+            stop, stride = start + 1, 1
+        if stride != 1:
+            return self[start:stop][::stride]
+        stop = max(stop, start)
+        # whole bytes covering the steps, then drop the bits before `start`
+        first = start * ENTRANCES // 8
+        last = (stop * ENTRANCES + 7) // 8
+        bits = np.unpackbits(self.bits[first:last])
+        skip = start * ENTRANCES - first * 8
+        rows = bits[skip:skip + (stop - start) * ENTRANCES].reshape(-1, ENTRANCES)
+        return rows if isinstance(index, slice) else rows[0]
+
+    def array(self):
+        return self[:]
+
+    def replay(self, start=0):
+        """
+        Yields one (j1, j2, j3, j4) tuple of arrivals per step.
+        """
+        for at in range(start, self.steps, CHUNK):
+            yield from map(tuple, self[at:at + CHUNK].tolist())
+
+
+class TraceWriter:
+    """
+    Records arrivals step by step (e.g. from a live run) and writes them
+    packed on close().
+    """
+
+    def __init__(self, filename, chances=(0, 0, 0, 0)):
+        self.filename = filename
+        self.chances = chances
+        self.rows = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, arrivals):
+        self.rows += bytes(arrivals)
+
+    def close(self):
+        trace = np.frombuffer(bytes(self.rows), dtype=np.uint8).reshape(-1, ENTRANCES)
+        save(self.filename, trace, self.chances)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and inspect arrival traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gen = commands.add_parser("generate", help="generate a trace from arrival chances")
+    gen.add_argument("-o", "--output", required=True)
+    gen.add_argument("--steps", type=int, default=100000)
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--chances", type=int, nargs=ENTRANCES, default=CHANCES, metavar="PERCENT")
+    gen.add_argument("--chances-from", metavar="TRAFFIC_PY", help="take the J*_CHANCE values of a traffic.py")
+    info = commands.add_parser("info", help="print the header and arrival rates of a trace")
+    info.add_argument("trace")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        chances = chances_from(args.chances_from) if args.chances_from else tuple(args.chances)
+        save(args.output, generate(args.steps, chances, args.seed), chances, args.seed)
+        print(f"{args.steps} steps, chances {chances}, seed {args.seed} written to {args.output}")
+    else:
+        trace = Trace(args.trace)
+        rates = trace.array().mean(axis=0) * 100 if len(trace) else np.zeros(ENTRANCES)
+        print(f"{len(trace)} steps, seed {trace.seed}, chances {trace.chances}")
+        print("arrival rates: " + " ".join(f"J{j + 1} {r:.1f}%" for j, r in enumerate(rates)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of the traffic controller versions v1 to v8 (and v7 with 32-bit
+counters, v7-32) on the same traffic.
+
+Runs the reference model of every version (see models.py) on seeded arrival
+traces, one run per (version, seed) in a pool of worker processes, and prints
+a table of:
+
+- the steps completed and how the runs ended (dropped packet, byte overflow),
+- the cars cleared from the junction,
+- the mean and 99th percentile wait per cleared car, in seconds,
+- simulation steps per second (of one worker process).
+
+Every version gets the same traces for the same seeds, so differences in the
+table come from the switch and client logic only. With --trace, every version
+runs once on a recorded trace file (see arrivals.py) instead.
+
+Usage:
+    python3 bench.py
+    python3 bench.py --steps 100000 --seeds 8 --chances 30 70 60 50 --cars 5 5 5 5
+    python3 bench.py --trace trace.arv
+"""
+
+import argparse
+import os
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import numpy as np
+
+import arrivals
+import models
+
+
+def run(version, trace, cars=(0, 0, 0, 0), params=None):
+    """
+    Runs one model over a trace. Returns (steps completed, end reason or None,
+    cars cleared, wait histogram in steps, seconds taken). params are keyword
+    arguments of the model (hard_limit, max_wait, cars_per_iteration).
+    """
+    model = models.MODELS[version](cars, **(params or {}))
+    trace = [tuple(row) for row in trace.tolist()]
+    # arrival step of every car still waiting, per entrance (FIFO)
+    queues = [[0] * c for c in cars]
+    heads = [0, 0, 0, 0]
+    waits = Counter()
+    cleared_total = 0
+    reason = None
+    at = 0
+    started = time.perf_counter()
+    try:
+        while at < len(trace):
+            n, cleared = model.step(trace, at)
+            for i in range(n):
+                step = at + i + 1
+                for j in range(4):
+                    c = cleared[i][j]
+                    if c:
+                        queue = queues[j]
+                        head = heads[j]
+                        for arrived in queue[head:head + c]:
+                            waits[step - arrived] += 1
+                        heads[j] = head + c
+                        cleared_total += c
+                for j, arrived in enumerate(trace[at + i]):
+                    if arrived:
+                        queues[j].append(step)
+            at += n
+    except models.RunEnded as ended:
+        reason = ended.args[0]
+    return at, reason, cleared_total, waits, time.perf_counter() - started
+
+
+def _job(args):
+    version, source, cars = args
+    if isinstance(source, str):
+        trace = arrivals.Trace(source).array()
+    else:
+        trace = arrivals.generate(*source)
+    return version, run(version, trace, cars)
+
+
+def percentile(hist, q):
+    """
+    q-th percentile of a {value: count} histogram.
+    """
+    if not hist:
+        return float("nan")
+    values = np.array(sorted(hist))
+    counts = np.array([hist[v] for v in values])
+    cum = np.cumsum(counts)
+    return float(values[np.searchsorted(cum, q / 100 * cum[-1])])
+
+
+def summarize(results):
+    """
+    Merges the runs of each version into one row of the table.
+    """
+    rows = {}
+    for version, (steps, reason, cleared, waits, seconds) in results:
+        row = rows.setdefault(version, {"runs": 0, "steps": 0, "ended": Counter(), "cleared": 0,
+                                        "waits": Counter(), "seconds": 0.0})
+        row["runs"] += 1
+        row["steps"] += steps
+        row["ended"][reason or "completed"] += 1
+        row["cleared"] += cleared
+        row["waits"].update(waits)
+        row["seconds"] += seconds
+    for row in rows.values():
+        waits = row.pop("waits")
+        total = sum(waits.values())
+        row["mean wait"] = sum(w * c for w, c in waits.items()) / total * models.SECONDS_PER_ITERATION if total else float("nan")
+        row["p99 wait"] = percentile(waits, 99) * models.SECONDS_PER_ITERATION
+        row["steps/s"] = row["steps"] / row["seconds"] if row["seconds"] else float("inf")
+    return rows
+
+
+def print_table(rows):
+    print(f"{'version':8}{'steps':>10}  {'ended':24}{'cleared':>9}{'mean wait':>11}{'p99 wait':>10}{'steps/s':>11}")
+    for version in sorted(rows):
+        row = rows[version]
+        ended = ", ".join(f"{n} {reason}" for reason, n in sorted(row["ended"].items()))
+        print(f"{version:8}{row['steps']:>10}  {ended:24}{row['cleared']:>9}"
+              f"{row['mean wait']:>10.1f}s{row['p99 wait']:>9.0f}s{row['steps/s']:>11.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the traffic controller versions on the same seeded traffic")
+    parser.add_argument("--versions", nargs="+", default=sorted(models.MODELS))
+    parser.add_argument("--steps", type=int, default=10000, help="steps per run")
+    parser.add_argument("--seeds", type=int, default=4, help="runs per version, with seeds 0..N-1")
+    parser.add_argument("--chances", type=int, nargs=4, default=arrivals.CHANCES, metavar="PERCENT",
+                        help="arrival chance of each entrance per step")
+    parser.add_argument("--cars", type=int, nargs=4, default=(0, 0, 0, 0), help="initial cars at each entrance")
+    parser.add_argument("--trace", help="run on this trace file instead of generated ones")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.trace:
+        trace = arrivals.Trace(args.trace)
+        sources = [args.trace]
+        description = f"{args.trace}: {len(trace)} steps, chances {trace.chances}"
+    else:
+        sources = [(args.steps, tuple(args.chances), seed) for seed in range(args.seeds)]
+        description = f"{args.steps} steps, chances {tuple(args.chances)}"
+    jobs = [(version, source, tuple(args.cars)) for version in args.versions for source in sources]
+    started = time.perf_counter()
+    with Pool(args.workers) as pool:
+        results = pool.map(_job, jobs)
+    print(f"{len(jobs)} runs of {description}, {time.perf_counter() - started:.1f} s with {args.workers} workers")
+    print_table(summarize(results))
+
+
+if __name__ == '__main__':
+    main()
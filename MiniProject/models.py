@@ -0,0 +1,464 @@
+"""
+Python reference models of the traffic controller, one per iteration in v1 to v7.
+
+Each model runs one round trip of its version per step: the packet the client
+in vN/traffic.py would send, the MyIngress logic of vN/traffic.p4 applied to
+it, and the client's update of the car counts from the response. Arrivals come
+from an arrival trace (see arrivals.py) instead of random.choices, so every
+version can be run on exactly the same traffic.
+
+The models keep the behaviour of each version as it is, including its bugs,
+because the point is to compare the versions as they were written:
+
+- v1: only J2 can get the green light (its result byte is the only one set),
+  and the client subtracts one car even from an empty entrance.
+- v2: the client sends neither the green light nor the timers, so J1 stays
+  green with green_car 0 and its cars are set to 0 every step.
+- v3: the timers are never reset and the green light is not wrapped around, so
+  green light 5 is dropped by the default action.
+- v4: the v6 logic, clearing one car per step.
+- v5: v4 plus the busy mode: when any entrance has 5 cars or more, green_car is
+  not set and the client runs Iterations (1 or 10) steps per response.
+- v6: clears CARS_PER_ITERATION cars per step, timers reset by the switch.
+- v7: v6 with 16-bit ("v7") or 32-bit ("v7-32") counters and timers.
+- v8: the v6 rules run on the switch, which keeps the state of every junction
+  in registers (StatefulSwitch); the client only sends its arrivals.
+
+HARD_LIMIT, MAX_WAIT and CARS_PER_ITERATION are the constants of traffic.py and
+traffic.p4; a model can be built with other values (hard_limit=, max_wait=,
+cars_per_iteration=) to try them without editing the programs (see sweep.py).
+
+v1 to v4 have no send_back in the apply block; the models still return the
+response so the switch logic can be compared.
+
+A run ends early when the switch drops the packet (the client times out) or
+when a field does not fit in its byte (scapy fails to build the packet), like
+the real client, which exits in both cases.
+"""
+
+import struct
+from abc import ABC, abstractmethod
+
+SECONDS_PER_ITERATION = 2 # Seconds each step models
+HARD_LIMIT = 20 # junction_timer value at which the light always changes
+MAX_WAIT = 4 # consecutive_timer value above which the light changes
+BUSY_CARS = 5 # v5: an entrance with this many cars makes the junction busy
+BUSY_LIMIT = 8 # v5: junction_timer limit in busy mode
+BUSY_ITERATIONS = 10 # v5: steps the client runs for one busy response
+
+# Percentage chance at each step that an entrance gets a new car in each client
+VERSION_CHANCES = {
+    "v1": (0, 25, 0, 0),
+    "v2": (20, 10, 20, 15),
+    "v3": (20, 10, 20, 15),
+    "v4": (90, 70, 80, 85),
+    "v5": (20, 10, 20, 15),
+    "v6": (30, 70, 60, 50),
+}
+
+
+class RunEnded(Exception):
+    """
+    Raised when the real client would have exited; the argument is the reason
+    ("dropped" or "overflow").
+    """
+
+
+class FieldOverflow(RunEnded, OverflowError):
+    """
+    RunEnded("overflow"): a value does not fit in its header field.
+    """
+
+
+def check_fits(hdr, width=8):
+    """
+    Every header field is a byte (XByteField) up to v6, the client cannot send
+    anything else. v7 widens the counters and timers to `width` bits.
+    """
+    for value in hdr.values():
+        if not 0 <= value < 1 << width:
+            raise FieldOverflow("overflow")
+
+
+def change_light(hdr, green_light, new_green_car, limit=HARD_LIMIT, reset=True, wrap=True, max_wait=MAX_WAIT):
+    """
+    check_if_should_change of v2 to v6 (and the busy variant of v5).
+    v2 and v3 neither reset the timers on a change nor wrap the light around.
+    """
+    new_green = green_light
+    if hdr["junction_timer"] == limit:
+        new_green = green_light + 1
+        if reset:
+            hdr["consecutive_timer"] = 0
+            hdr["junction_timer"] = 0
+    elif new_green_car > 0 and hdr["consecutive_timer"] <= max_wait:
+        hdr["consecutive_timer"] = 0
+    elif hdr["consecutive_timer"] > max_wait:
+        new_green = green_light + 1
+        if reset:
+            hdr["consecutive_timer"] = 0
+            hdr["junction_timer"] = 0
+    if wrap and new_green > 4:
+        new_green -= 4
+    hdr["green_light"] = new_green & 0xff
+
+
+def switch_v1(hdr):
+    if hdr["j2_car"] > 0:
+        hdr["j2_result"] = 1
+    for j in range(1, 5):
+        if hdr[f"j{j}_result"] == 1:
+            hdr["green_light"] = j
+            hdr["green_car"] = hdr[f"j{j}_car"]
+            for other in range(1, 5):
+                if other != j:
+                    hdr[f"j{other}_result"] = 0
+            break
+    return hdr
+
+
+def switch_v2(hdr, reset=False, wrap=False, set_green_car=False, limit=HARD_LIMIT, max_wait=MAX_WAIT):
+    if not 1 <= hdr["green_light"] <= 4:
+        return None # const default_action = operation_drop()
+    change_light(hdr, hdr["green_light"], hdr["new_green_car"], limit, reset, wrap, max_wait)
+    if set_green_car and 1 <= hdr["green_light"] <= 4:
+        hdr["green_car"] = hdr[f"j{hdr['green_light']}_car"]
+    return hdr
+
+
+def switch_v3(hdr, **rules):
+    return switch_v2(hdr, set_green_car=True, **rules)
+
+
+def switch_v4(hdr, **rules):
+    return switch_v2(hdr, reset=True, wrap=True, set_green_car=True, **rules)
+
+
+def switch_v5(hdr, limit=HARD_LIMIT, max_wait=MAX_WAIT):
+    if not 1 <= hdr["green_light"] <= 4:
+        return None
+    change_light(hdr, hdr["green_light"], hdr["new_green_car"], limit, max_wait=max_wait)
+    if any(hdr[f"j{j}_car"] >= BUSY_CARS for j in range(1, 5)):
+        hdr["busy"] = 1
+    if hdr["busy"] == 0:
+        hdr["green_car"] = hdr[f"j{hdr['green_light']}_car"]
+    elif 1 <= hdr["busy"] <= 4:
+        # busy_control: implement_busyN for busy == N
+        if hdr["green_light"] != hdr["busy"]:
+            change_light(hdr, hdr["green_light"], hdr["new_green_car"], limit=BUSY_LIMIT, max_wait=max_wait)
+        else:
+            hdr["iterations"] = BUSY_ITERATIONS
+    return hdr
+
+
+def switch_v6(hdr, **rules):
+    return switch_v4(hdr, **rules)
+
+
+class Model(ABC):
+    """
+    Client state of one version. step() takes the trace (a list of per-step
+    arrival tuples) and the index of the next step, and returns how many steps
+    it used and the cars cleared from each entrance in each of them.
+    hard_limit, max_wait and cars_per_iteration override the constants of the
+    programs (cars_per_iteration replaces cleared_per_step). Subclasses
+    implement switch(), the P4 program of the version.
+    """
+    version = None
+    cleared_per_step = 1
+    width = 8 # bits of the counters and timers in the header
+
+    def __init__(self, cars=(0, 0, 0, 0), hard_limit=HARD_LIMIT, max_wait=MAX_WAIT, cars_per_iteration=None):
+        self.rules = {"limit": hard_limit, "max_wait": max_wait}
+        if cars_per_iteration is not None:
+            self.cleared_per_step = cars_per_iteration
+        self.cars = list(cars)
+        self.green = 1
+        self.junction_timer = 0
+        self.consecutive_timer = 0
+        self.new_green_car = 0
+
+    def packet(self):
+        hdr = {"green_light": self.green, "green_car": 0,
+               "junction_timer": self.junction_timer, "consecutive_timer": self.consecutive_timer,
+               "j1_car": self.cars[0], "j2_car": self.cars[1], "j3_car": self.cars[2], "j4_car": self.cars[3],
+               "new_green_car": self.new_green_car}
+        check_fits(hdr, self.width)
+        return hdr
+
+    @abstractmethod
+    def switch(self, hdr):
+        """
+        Returns the switch's response to the header dict hdr.
+        """
+
+    def simulate(self, cars):
+        return max(cars - self.cleared_per_step, 0)
+
+    def update(self, resp, arrivals):
+        """
+        The client's part of one step: returns the cars cleared per entrance.
+        """
+        green = resp["green_light"]
+        self.junction_timer = resp["junction_timer"] + SECONDS_PER_ITERATION
+        self.consecutive_timer = resp["consecutive_timer"] + SECONDS_PER_ITERATION
+        newcar = self.simulate(resp["green_car"])
+        cleared = [0, 0, 0, 0]
+        if 1 <= green <= 4:
+            cleared[green - 1] = max(self.cars[green - 1] - newcar, 0)
+            self.cars[green - 1] = newcar
+            self.new_green_car = arrivals[green - 1]
+        for j in range(4):
+            self.cars[j] += arrivals[j]
+        return cleared
+
+    def step(self, trace, at):
+        resp = self.switch(self.packet())
+        if resp is None:
+            raise RunEnded("dropped")
+        self.green = resp["green_light"]
+        return 1, [self.update(resp, trace[at])]
+
+
+class V1(Model):
+    version = "v1"
+
+    def packet(self):
+        hdr = {"green_light": 1, "green_car": 0,
+               "j1_car": self.cars[0], "j2_car": self.cars[1], "j3_car": self.cars[2], "j4_car": self.cars[3],
+               "j1_result": 0xca, "j2_result": 0xfe, "j3_result": 0xca, "j4_result": 0xfe}
+        check_fits(hdr, self.width)
+        return hdr
+
+    def switch(self, hdr):
+        return switch_v1(hdr)
+
+    def simulate(self, cars):
+        # the client sends cars - 1 even for an empty entrance, which scapy
+        # cannot pack; stop at 0 so the run can go on
+        return max(cars - 1, 0)
+
+    def update(self, resp, arrivals):
+        green = resp["green_light"]
+        newcar = self.simulate(resp["green_car"])
+        cleared = [0, 0, 0, 0]
+        if 1 <= green <= 4:
+            cleared[green - 1] = max(self.cars[green - 1] - newcar, 0)
+            self.cars[green - 1] = newcar
+        for j in range(4):
+            self.cars[j] += arrivals[j]
+        return cleared
+
+
+class V2(Model):
+    version = "v2"
+
+    def packet(self):
+        hdr = super().packet()
+        # only the car counts are sent, everything else keeps its default
+        hdr.update(green_light=1, junction_timer=0, consecutive_timer=0, new_green_car=0)
+        return hdr
+
+    def switch(self, hdr):
+        return switch_v2(hdr, **self.rules)
+
+
+class V3(Model):
+    version = "v3"
+
+    def packet(self):
+        hdr = super().packet()
+        hdr["new_green_car"] = 0 # never sent
+        return hdr
+
+    def switch(self, hdr):
+        return switch_v3(hdr, **self.rules)
+
+
+class V4(Model):
+    version = "v4"
+
+    def switch(self, hdr):
+        return switch_v4(hdr, **self.rules)
+
+
+class V5(Model):
+    version = "v5"
+
+    def packet(self):
+        hdr = super().packet()
+        hdr.update(busy=0, iterations=1)
+        return hdr
+
+    def switch(self, hdr):
+        return switch_v5(hdr, **self.rules)
+
+    def step(self, trace, at):
+        resp = self.switch(self.packet())
+        if resp is None:
+            raise RunEnded("dropped")
+        self.green = resp["green_light"]
+        # the client runs Iterations steps on the same response
+        n = min(resp["iterations"], len(trace) - at)
+        return n, [self.update(resp, trace[at + i]) for i in range(n)]
+
+
+class V6(Model):
+    version = "v6"
+    cleared_per_step = 2 # CARS_PER_ITERATION
+
+    def switch(self, hdr):
+        return switch_v6(hdr, **self.rules)
+
+
+class V7(V6):
+    version = "v7"
+    width = 16
+
+
+class V7Wide32(V7):
+    version = "v7-32"
+    width = 32
+
+
+# v8: stateful protocol
+ETHERTYPE = b"\x12\x34"
+V8_VERSION = 0x04
+V8_HEADER = struct.Struct("!2sBBBBHB") # P4, version, junction, op << 4 | arrivals, green_light, green_car, cleared
+OP_STEP = 0
+OP_ADD = 1
+OP_RESET = 2
+JUNCTIONS = 256 # register slots, one per junction ID
+CARS_PER_ITERATION = 2
+
+
+class StatefulSwitch:
+    """
+    The register-backed pipeline of v8/traffic.p4. The registers are lists
+    indexed by junction ID (cars by junction ID * 4 + entrance - 1) and keep
+    the P4 bit widths, so the counts wrap around where the switch's would.
+    """
+
+    def __init__(self, junctions=JUNCTIONS, hard_limit=HARD_LIMIT, max_wait=MAX_WAIT,
+                 cars_per_iteration=CARS_PER_ITERATION):
+        self.hard_limit = hard_limit
+        self.max_wait = max_wait
+        self.cars_per_iteration = cars_per_iteration
+        self.cars = [0] * (junctions * 4)      # bit<16>
+        self.green_light = [0] * junctions     # bit<8>
+        self.junction_timer = [0] * junctions  # bit<8>
+        self.consecutive_timer = [0] * junctions
+        self.new_green_car = [0] * junctions
+
+    def apply(self, hdr):
+        """
+        MyIngress on a decoded header (a dict with the header fields).
+        Fills in the reply fields and returns hdr, or None if the packet is dropped.
+        """
+        op = hdr["op"]
+        if op > OP_RESET:
+            return None
+        junction = hdr["junction"]
+        base = junction * 4
+        cars = self.cars[base:base + 4]
+        green = self.green_light[junction] or 1
+        jt = self.junction_timer[junction]
+        ct = self.consecutive_timer[junction]
+        new_car = self.new_green_car[junction]
+        cleared = 0
+        if op == OP_RESET:
+            cars = [0, 0, 0, 0]
+            green, jt, ct, new_car = 1, 0, 0, 0
+        elif op == OP_ADD:
+            if 1 <= hdr["green_light"] <= 4:
+                e = hdr["green_light"] - 1
+                cars[e] = (cars[e] + hdr["green_car"]) & 0xffff
+        else:
+            if jt == self.hard_limit:
+                green += 1
+                ct = jt = 0
+            elif new_car > 0 and ct <= self.max_wait:
+                ct = 0
+            elif ct > self.max_wait:
+                green += 1
+                ct = jt = 0
+            if green > 4:
+                green -= 4
+            arrivals = [(hdr["arrivals"] >> e) & 1 for e in range(4)]
+            e = green - 1
+            cleared = min(cars[e], self.cars_per_iteration)
+            cars[e] -= cleared
+            new_car = arrivals[e]
+            jt = (jt + SECONDS_PER_ITERATION) & 0xff
+            ct = (ct + SECONDS_PER_ITERATION) & 0xff
+            cars = [(c + a) & 0xffff for c, a in zip(cars, arrivals)]
+        self.cars[base:base + 4] = cars
+        self.green_light[junction] = green
+        self.junction_timer[junction] = jt
+        self.consecutive_timer[junction] = ct
+        self.new_green_car[junction] = new_car
+        hdr["green_light"] = green
+        hdr["green_car"] = cars[green - 1]
+        hdr["cleared"] = cleared
+        return hdr
+
+    def process(self, frame):
+        """
+        The whole pipeline on an Ethernet frame: parser, MyIngress and
+        deparser. Returns the reply frame, or None if it is dropped.
+        """
+        if len(frame) < 14 + V8_HEADER.size or frame[12:14] != ETHERTYPE:
+            return None
+        magic, version, junction, op_arrivals, green, green_car, cleared = V8_HEADER.unpack_from(frame, 14)
+        if magic != b"P4" or version != V8_VERSION:
+            return None
+        hdr = self.apply({"junction": junction, "op": op_arrivals >> 4, "arrivals": op_arrivals & 0xf,
+                          "green_light": green, "green_car": green_car, "cleared": cleared})
+        if hdr is None:
+            return None
+        return (frame[6:12] + frame[0:6] + ETHERTYPE
+                + V8_HEADER.pack(magic, version, junction, op_arrivals, hdr["green_light"], hdr["green_car"], hdr["cleared"])
+                + frame[14 + V8_HEADER.size:])
+
+
+class V8(Model):
+    version = "v8"
+    width = 16
+
+    def __init__(self, cars=(0, 0, 0, 0), pipeline=None, junction=0, hard_limit=HARD_LIMIT, max_wait=MAX_WAIT,
+                 cars_per_iteration=CARS_PER_ITERATION):
+        super().__init__(cars, hard_limit, max_wait, cars_per_iteration)
+        self.pipeline = pipeline or StatefulSwitch(hard_limit=hard_limit, max_wait=max_wait,
+                                                   cars_per_iteration=cars_per_iteration)
+        self.junction = junction
+        self.send(OP_RESET)
+        for e, c in enumerate(cars):
+            if c:
+                self.send(OP_ADD, green_light=e + 1, green_car=c)
+
+    def send(self, op, arrivals=0, green_light=0, green_car=0):
+        hdr = {"junction": self.junction, "op": op, "arrivals": arrivals,
+               "green_light": green_light, "green_car": green_car, "cleared": 0}
+        check_fits(hdr, self.width)
+        resp = self.switch(hdr)
+        if resp is None:
+            raise RunEnded("dropped")
+        return resp
+
+    def switch(self, hdr):
+        # the switch keeps the state in its registers: one pipeline per run, shared by the junctions
+        return self.pipeline.apply(hdr)
+
+    def step(self, trace, at):
+        arrivals = trace[at]
+        base = self.junction * 4
+        if any(a and self.pipeline.cars[base + e] == 0xffff for e, a in enumerate(arrivals)):
+            raise FieldOverflow("overflow") # the register would wrap around
+        mask = arrivals[0] | arrivals[1] << 1 | arrivals[2] << 2 | arrivals[3] << 3
+        resp = self.send(OP_STEP, arrivals=mask)
+        cleared = [0, 0, 0, 0]
+        cleared[resp["green_light"] - 1] = resp["cleared"]
+        return 1, [cleared]
+
+
+MODELS = {m.version: m for m in (V1, V2, V3, V4, V5, V6, V7, V7Wide32, V8)}
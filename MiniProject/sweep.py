@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+"""
+Parameter sweep of the traffic controller on the reference models.
+
+HARD_LIMIT, MAX_WAIT, CARS_PER_ITERATION and the arrival chances are constants
+of traffic.py and traffic.p4. Instead of editing them and rerunning by hand,
+this expands a grid of values, runs every point (one model run on one seeded
+trace, see bench.run) in a pool of worker processes, and appends each result
+to a JSON Lines store as soon as it is done:
+
+    {"point": {"version": "v7", "hard_limit": 20, ..., "seed": 0}, "result": {...}}
+
+The store is append-only. Points already in it are skipped, so an interrupted
+sweep is resumed by running the same command again, and a larger grid only
+runs the new points. At the end, the points are averaged over their seeds and
+the best settings are printed (from the whole store, this run or earlier ones).
+
+Usage:
+    python3 sweep.py -o sweep.jsonl
+    python3 sweep.py -o sweep.jsonl --hard-limit 10 20 30 40 --max-wait 2 4 6 8 \\
+        --cars-per-iteration 1 2 3 --chances 30,70,60,50 50,50,50,50 --seeds 4
+    python3 sweep.py -o sweep.jsonl --report-only --top 20
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+
+import arrivals
+import bench
+import models
+
+PARAMS = ("hard_limit", "max_wait", "cars_per_iteration") # keyword arguments of the models
+SORT_KEYS = ("mean wait", "p99 wait", "waiting")
+
+
+def expand(args):
+    """
+    The points of the grid, one dict per combination and seed.
+    """
+    grid = itertools.product(args.versions, args.hard_limit, args.max_wait, args.cars_per_iteration,
+                             args.chances, range(args.seeds))
+    return [{"version": version, "hard_limit": hard_limit, "max_wait": max_wait,
+             "cars_per_iteration": cars_per_iteration, "chances": list(chances),
+             "steps": args.steps, "cars": list(args.cars), "seed": seed}
+            for version, hard_limit, max_wait, cars_per_iteration, chances, seed in grid]
+
+
+def point_key(point):
+    return json.dumps(point, sort_keys=True)
+
+
+def run_point(point):
+    """
+    One model run. Returns (point, result), in a worker process.
+    """
+    trace = arrivals.generate(point["steps"], tuple(point["chances"]), point["seed"])
+    params = {name: point[name] for name in PARAMS}
+    steps, reason, cleared, waits, seconds = bench.run(point["version"], trace, tuple(point["cars"]), params)
+    total = sum(waits.values())
+    arrived = int(trace[:steps].sum()) + sum(point["cars"])
+    return point, {
+        "steps": steps,
+        "ended": reason or "completed",
+        "cleared": cleared,
+        "waiting": arrived - cleared, # cars left at the junction at the end
+        "mean wait": sum(w * c for w, c in waits.items()) / total * models.SECONDS_PER_ITERATION if total else None,
+        "p99 wait": bench.percentile(waits, 99) * models.SECONDS_PER_ITERATION if total else None,
+        "seconds": seconds,
+    }
+
+
+class ResultStore:
+    """
+    Append-only JSON Lines file of (point, result) records. A line cut short by
+    an interruption is dropped when the store is opened.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.records = []
+        good = 0
+        if os.path.exists(filename):
+            with open(filename, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        self.records.append(json.loads(line))
+                    except ValueError:
+                        break
+                    good += len(line)
+            if good != os.path.getsize(filename):
+                with open(filename, "r+b") as f:
+                    f.truncate(good)
+        self.done = {point_key(record["point"]) for record in self.records}
+        self.file = open(filename, "a")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.file.close()
+
+    def add(self, point, result):
+        record = {"point": point, "result": result}
+        # one write per line, flushed, so an interruption loses at most the line being written
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.records.append(record)
+        self.done.add(point_key(point))
+
+
+def report(records, top, sort):
+    """
+    Averages the runs of each setting over its seeds and prints the best ones.
+    """
+    settings = defaultdict(list)
+    for record in records:
+        point = dict(record["point"])
+        point.pop("seed")
+        settings[point_key(point)].append(record["result"])
+    rows = []
+    for key, results in settings.items():
+        point = json.loads(key)
+        completed = sum(r["ended"] == "completed" for r in results)
+        means = [r["mean wait"] for r in results if r["mean wait"] is not None]
+        p99s = [r["p99 wait"] for r in results if r["p99 wait"] is not None]
+        rows.append({**point, "runs": len(results), "completed": completed,
+                     "mean wait": sum(means) / len(means) if means else float("inf"),
+                     "p99 wait": max(p99s) if p99s else float("inf"),
+                     "waiting": sum(r["waiting"] for r in results) / len(results)})
+    # settings that let a run end early (dropped, overflow) go last
+    rows.sort(key=lambda row: (row["completed"] < row["runs"], row[sort]))
+    print(f"{'version':8}{'hard':>5}{'wait':>5}{'cars':>5}  {'chances':16}{'runs':>5}{'done':>5}"
+          f"{'mean wait':>11}{'p99 wait':>10}{'waiting':>9}")
+    for row in rows[:top]:
+        chances = ",".join(map(str, row["chances"]))
+        print(f"{row['version']:8}{row['hard_limit']:>5}{row['max_wait']:>5}{row['cars_per_iteration']:>5}  "
+              f"{chances:16}{row['runs']:>5}{row['completed']:>5}"
+              f"{row['mean wait']:>10.1f}s{row['p99 wait']:>9.0f}s{row['waiting']:>9.1f}")
+
+
+def chances(text):
+    values = tuple(int(v) for v in text.split(","))
+    if len(values) != arrivals.ENTRANCES:
+        raise argparse.ArgumentTypeError(f"{arrivals.ENTRANCES} comma-separated percentages expected")
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the controller constants on the reference models")
+    parser.add_argument("-o", "--output", required=True, help="JSON Lines result store, resumed if it exists")
+    parser.add_argument("--versions", nargs="+", default=["v7"], help="models to run (v6 to v8 use all the constants)")
+    parser.add_argument("--hard-limit", type=int, nargs="+", default=[models.HARD_LIMIT])
+    parser.add_argument("--max-wait", type=int, nargs="+", default=[models.MAX_WAIT])
+    parser.add_argument("--cars-per-iteration", type=int, nargs="+", default=[models.CARS_PER_ITERATION])
+    parser.add_argument("--chances", type=chances, nargs="+", default=[arrivals.CHANCES], metavar="J1,J2,J3,J4")
+    parser.add_argument("--seeds", type=int, default=4, help="runs per setting, with seeds 0..N-1")
+    parser.add_argument("--steps", type=int, default=10000, help="steps per run")
+    parser.add_argument("--cars", type=int, nargs=4, default=(0, 0, 0, 0), help="initial cars at each entrance")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--top", type=int, default=10, help="settings to print")
+    parser.add_argument("--sort", choices=SORT_KEYS, default="mean wait")
+    parser.add_argument("--report-only", action="store_true", help="only print the report of the store")
+    args = parser.parse_args()
+
+    unknown = set(args.versions) - set(models.MODELS)
+    if unknown:
+        parser.error(f"unknown version {', '.join(sorted(unknown))}")
+
+    with ResultStore(args.output) as store:
+        if not args.report_only:
+            points = expand(args)
+            todo = [point for point in points if point_key(point) not in store.done]
+            print(f"{len(points)} points, {len(points) - len(todo)} already in {args.output}, "
+                  f"running {len(todo)} with {args.workers} workers")
+            started = time.perf_counter()
+            with Pool(args.workers) as pool:
+                chunksize = max(1, len(todo) // (args.workers * 16))
+                for n, (point, result) in enumerate(pool.imap_unordered(run_point, todo, chunksize), 1):
+                    store.add(point, result)
+                    if n % 100 == 0 or n == len(todo):
+                        elapsed = time.perf_counter() - started
+                        print(f"  {n}/{len(todo)} points, {elapsed:.1f} s", flush=True)
+        report(store.records, args.top, args.sort)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Tests of the v7 wide counters: the overflow checks of the client and of the
+reference model, and the codec of the three layouts.
+
+Usage:
+    python3 -m pytest test_v7.py
+    python3 -m unittest test_v7
+"""
+
+import importlib.util
+import os
+import unittest
+
+import models
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIMITS = {8: 255, 16: 65535} # largest value of each counter width
+
+
+def load_client():
+    spec = importlib.util.spec_from_file_location("v7_traffic", os.path.join(HERE, "v7", "traffic.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+traffic = load_client()
+
+
+class CheckFitsTest(unittest.TestCase):
+
+    def test_client_limits(self):
+        for width, limit in LIMITS.items():
+            traffic.check_fits(width, J1_car=limit)
+            with self.assertRaises(OverflowError):
+                traffic.check_fits(width, J1_car=limit + 1)
+
+    def test_model_limits(self):
+        for width, limit in LIMITS.items():
+            models.check_fits({"j1_car": limit}, width)
+            with self.assertRaises(OverflowError):
+                models.check_fits({"j1_car": limit + 1}, width)
+
+    def test_model_overflow_ends_run(self):
+        with self.assertRaises(models.RunEnded) as ended:
+            models.check_fits({"j1_car": 256})
+        self.assertEqual(ended.exception.args[0], "overflow")
+
+
+class CodecTest(unittest.TestCase):
+
+    def round_trip(self, width, **fields):
+        layer = traffic.LAYOUTS[traffic.VERSIONS[width]]
+        pkt = traffic.Ether(dst="e4:5f:01:84:8c:5e", type=0x1234) / layer(**fields) / " "
+        data = bytes(pkt)
+        self.assertIs(traffic.P4Traffic.dispatch_hook(data[14:]), layer)
+        return traffic.Ether(data)[traffic.P4Traffic]
+
+    def test_versions(self):
+        for width, version in traffic.VERSIONS.items():
+            limit = (1 << width) - 1
+            header = self.round_trip(width, Green_Light=3, Green_Car=limit, J4_car=limit)
+            self.assertIs(type(header), traffic.LAYOUTS[version])
+            self.assertEqual(header.version, version)
+            self.assertEqual((header.Green_Light, header.Green_Car, header.J4_car), (3, limit, limit))
+
+    def test_wide_32(self):
+        counts = {"J1_car": 70000, "J2_car": 0xffffffff, "Junction_Timer": 1 << 31, "New_green_car": 1}
+        traffic.check_fits(32, **counts)
+        header = self.round_trip(32, **counts)
+        self.assertIsInstance(header, traffic.P4Traffic32)
+        for name, value in counts.items():
+            self.assertEqual(getattr(header, name), value)
+
+
+if __name__ == '__main__':
+    unittest.main()
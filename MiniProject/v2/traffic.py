@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 
+import os
 import re
+import sys
 import time
 import random
 
-from scapy.all import *
+# Minimal scapy-compatible codec (../../scripts/p4pkt.py): scapy itself is only imported by pkt.show()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts"))
+from p4pkt import *
 
 class P4Traffic(Packet):
     name = "P4Traffic"
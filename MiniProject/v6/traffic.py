@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 
+import os
 import re
+import sys
 import time
+import atexit
 import random
 
-from scapy.all import *
+# Minimal scapy-compatible codec (../../scripts/p4pkt.py): scapy itself is only imported by pkt.show()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts"))
+from p4pkt import *
 
 """
 CONSTANTS
@@ -31,8 +36,8 @@ class P4Traffic(Packet):
                     XByteField("version", 0x01),  
                     XByteField("Green_Light", 0x01),       # Let the initial green light be at Junction 1
                     XByteField("Green_Car", 0x00),         # How many cars there are at the greenlit entrance
-		            XByteField("Junction_Timer", 0x00),    # Timer for how long the light has been green at a particular entrance
-		            XByteField("Consecutive_Timer", 0x00), # Timer between new cars entering the same entrance of a green entrance
+                    XByteField("Junction_Timer", 0x00),    # Timer for how long the light has been green at a particular entrance
+                    XByteField("Consecutive_Timer", 0x00), # Timer between new cars entering the same entrance of a green entrance
                     XByteField("J1_car", 0x00),            # Number
                     XByteField("J2_car", 0x00),            # of cars
                     XByteField("J3_car", 0x00),            # at each
@@ -53,7 +58,7 @@ def simulate(cars, junction_timer, consecutive_timer):
     if cars - CARS_PER_ITERATION > 0:
         return cars - CARS_PER_ITERATION, junction_timer, consecutive_timer
     else:
-    	return 0, junction_timer, consecutive_timer
+        return 0, junction_timer, consecutive_timer
 
 def main():
     """
@@ -64,7 +69,7 @@ def main():
     # Take in command line arguments, with error checking that the correct arguments are given
     # The 3rd up to 6th arguments describe the initial number of cars at each junction entrance
     if len(sys.argv) < 6:
-        print("Usage: python traffic.py [add|quit] <junction1_car> <junction2_car> <junction3_car> <junction4_car>")
+        print("Usage: python traffic.py [add|quit] <junction1_car> <junction2_car> <junction3_car> <junction4_car> [--replay|--record <trace file>]")
         sys.exit(2)
     elif sys.argv[1] == "quit":
         sys.exit(1)
@@ -80,6 +85,19 @@ def main():
     print("Added successfully:")
     print(f"{j1_car} cars to Entrance 1\n{j2_car} cars to Entrance 2\n{j3_car} cars to Entrance 3\n{j4_car} cars to Entrance 4")
 
+    # Optionally take the new cars from a recorded arrival trace (see ../arrivals.py) instead of random.choices,
+    # so that runs can be repeated exactly, or record the random arrivals of this run into a trace
+    replay = None
+    recorder = None
+    if len(sys.argv) >= 8 and sys.argv[6] in ("--replay", "--record"):
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+        import arrivals
+        if sys.argv[6] == "--replay":
+            replay = arrivals.Trace(sys.argv[7]).replay()
+        else:
+            recorder = arrivals.TraceWriter(sys.argv[7], (J1_CHANCE, J2_CHANCE, J3_CHANCE, J4_CHANCE))
+            atexit.register(recorder.close) # the loop only ends by exiting
+
     # Initial values to be passed onto the packet's fields.
     # While we have defined default values above, since we are feeding output from the previous iteration into the inputs of the next iteration,
     # and we are using the same variables, these variables need to be initialised for the first iteration.
@@ -91,7 +109,7 @@ def main():
 
     # Iterate to model the traffic flow over discretised timestamps
     while True:
-    	try:
+        try:
             # Establish the destination of packet, Ethernet type to use, and any variables to send with non-default values
             pkt = Ether(dst='e4:5f:01:84:8c:5e', type=0x1234) / P4Traffic(J1_car = j1_car,
                                                                           J2_car = j2_car,
@@ -117,14 +135,23 @@ def main():
                     newcar, junction_timer, consecutive_timer = simulate(p4traffic.Green_Car, p4traffic.Junction_Timer, p4traffic.Consecutive_Timer) 
                     
                     # randomly decide whether or not to add a car into each of the junction entrances
-                    addn_j1_car = random.choices([0, 1], weights=[100-J1_CHANCE, J1_CHANCE])[0]
-                    addn_j2_car = random.choices([0, 1], weights=[100-J2_CHANCE, J2_CHANCE])[0]
-                    addn_j3_car = random.choices([0, 1], weights=[100-J3_CHANCE, J3_CHANCE])[0]
-                    addn_j4_car = random.choices([0, 1], weights=[100-J4_CHANCE, J4_CHANCE])[0]
+                    if replay is not None:
+                        arrived = next(replay, None)
+                        if arrived is None:
+                            print("End of arrival trace")
+                            sys.exit(0)
+                        addn_j1_car, addn_j2_car, addn_j3_car, addn_j4_car = arrived
+                    else:
+                        addn_j1_car = random.choices([0, 1], weights=[100-J1_CHANCE, J1_CHANCE])[0]
+                        addn_j2_car = random.choices([0, 1], weights=[100-J2_CHANCE, J2_CHANCE])[0]
+                        addn_j3_car = random.choices([0, 1], weights=[100-J3_CHANCE, J3_CHANCE])[0]
+                        addn_j4_car = random.choices([0, 1], weights=[100-J4_CHANCE, J4_CHANCE])[0]
+                        if recorder is not None:
+                            recorder.add((addn_j1_car, addn_j2_car, addn_j3_car, addn_j4_car))
                     
                     # after simulation, update the number of cars on the green entrance
                     # moreover, update the number of new cars entering the green entrance
-                    if p4traffic.Green_Light == 0x01:   	            	    
+                    if p4traffic.Green_Light == 0x01:
                         j1_car = newcar
                         new_green_car = addn_j1_car
                     elif p4traffic.Green_Light == 0x02:
@@ -161,13 +188,13 @@ def main():
                     time.sleep(SLEEP_TIME) # additional sleep to help read the CLI output
                 else:
                     print("cannot find P4Traffic header in the packet")
-    	        
+
             else:
                 print("Didn't receive response")
                 sys.exit(3)
         except Exception as error:
             print(error)
             sys.exit(4)
-    	
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import sys
+import time
+import atexit
+import random
+
+# Minimal scapy-compatible codec (../../scripts/p4pkt.py): scapy itself is only imported by pkt.show()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts"))
+from p4pkt import *
+
+"""
+CONSTANTS
+"""
+SLEEP_TIME = 0.5 # Amount of seconds to sleep in some of the sleep functions. Useful for reading command-line outputs
+SECONDS_PER_ITERATION = 2 # Amount of seconds each iteration of the while loop should model
+CARS_PER_ITERATION = 2 # Number of cars that can pass through the junction each iteration
+
+# Percentage chance at each iteration this junction will get a new car incoming
+J1_CHANCE = 30
+J2_CHANCE = 70
+J3_CHANCE = 60
+J4_CHANCE = 50
+
+# Counter width in bits -> value of the version byte. Version 0x01 is the original layout of v6.
+VERSIONS = {8: 0x01, 16: 0x02, 32: 0x03}
+WIDTH = 16 # Default counter width, enough for rush-hour queues and long runs
+
+
+
+def traffic_fields(version, counter):
+    """
+    Fields of the header, with the counters and timers built by `counter` (one, two or four bytes).
+    """
+    return [ StrFixedLenField("P", "P", length=1),
+             StrFixedLenField("Four", "4", length=1),
+             XByteField("version", version),
+             XByteField("Green_Light", 0x01),    # Let the initial green light be at Junction 1
+             counter("Green_Car", 0),            # How many cars there are at the greenlit entrance
+             counter("Junction_Timer", 0),       # Timer for how long the light has been green at a particular entrance
+             counter("Consecutive_Timer", 0),    # Timer between new cars entering the same entrance of a green entrance
+             counter("J1_car", 0),               # Number
+             counter("J2_car", 0),               # of cars
+             counter("J3_car", 0),               # at each
+             counter("J4_car", 0),               # entrance
+             counter("New_green_car", 0)]        # Number of cars entering the green junction at each iteration
+
+
+class P4Traffic(Packet):
+    """
+    Defines the format of the sent packet. The version byte selects the layout: in version 0x01 each field is
+    worth 1 byte, in the wide versions the counters and timers take 2 (0x02) or 4 (0x03) bytes.
+    """
+    name = "P4Traffic"
+    fields_desc = traffic_fields(VERSIONS[8], XByteField)
+    match_subclass = True # resp[P4Traffic] also finds the wide layouts
+
+    @classmethod
+    def dispatch_hook(cls, _pkt=None, *args, **kargs):
+        """
+        Picks the layout of a received header from its version byte.
+        """
+        if _pkt and len(_pkt) >= 3:
+            return LAYOUTS.get(_pkt[2], P4Traffic)
+        return cls
+
+
+class P4Traffic16(P4Traffic):
+    name = "P4Traffic16"
+    fields_desc = traffic_fields(VERSIONS[16], ShortField)
+
+
+class P4Traffic32(P4Traffic):
+    name = "P4Traffic32"
+    fields_desc = traffic_fields(VERSIONS[32], IntField)
+
+
+LAYOUTS = {VERSIONS[8]: P4Traffic, VERSIONS[16]: P4Traffic16, VERSIONS[32]: P4Traffic32}
+WIDTHS = {P4Traffic: 8, P4Traffic16: 16, P4Traffic32: 32}
+
+bind_layers(Ether, P4Traffic, type=0x1234)
+    
+def simulate(cars, junction_timer, consecutive_timer):
+    """
+    Simulates the cars passing through the junction by decrement the number of cars at the green entrance.
+    Also implements the timer that keeps track of how long this particular entrance has been green for (junction_time)
+    and the amount of time since the last time a new car entered the green entrance (consecutive_timer)
+    """
+    time.sleep(SLEEP_TIME) # let the time taken for a car to clear the junction be 2s.
+    junction_timer += SECONDS_PER_ITERATION
+    consecutive_timer += SECONDS_PER_ITERATION
+    if cars - CARS_PER_ITERATION > 0:
+        return cars - CARS_PER_ITERATION, junction_timer, consecutive_timer
+    else:
+        return 0, junction_timer, consecutive_timer
+
+def check_fits(width, **fields):
+    """
+    Makes sure every counter fits in the header before it is packed,
+    instead of letting the switch see a wrapped-around value.
+    """
+    for name, value in fields.items():
+        if not 0 <= value < 1 << width:
+            raise OverflowError(f"{name} = {value} does not fit in {width} bits, use a wider header (--wide 32)")
+
+def main():
+    """
+    Main function
+    """
+    iface = "enx0c37965f8a0f"
+    
+    # Take in command line arguments, with error checking that the correct arguments are given
+    # The 3rd up to 6th arguments describe the initial number of cars at each junction entrance
+    if len(sys.argv) < 6:
+        print("Usage: python traffic.py [add|quit] <junction1_car> <junction2_car> <junction3_car> <junction4_car> [--wide 8|16|32] [--replay|--record <trace file>]")
+        sys.exit(2)
+    elif sys.argv[1] == "quit":
+        sys.exit(1)
+    elif sys.argv[1] != "add":
+        print("First command line argument is 'add' for normal usage")
+    else:
+        j1_car = int(sys.argv[2])
+        j2_car = int(sys.argv[3])
+        j3_car = int(sys.argv[4])
+        j4_car = int(sys.argv[5])
+    
+    # Confirmation about the number of cars added at each junction entrance
+    print("Added successfully:")
+    print(f"{j1_car} cars to Entrance 1\n{j2_car} cars to Entrance 2\n{j3_car} cars to Entrance 3\n{j4_car} cars to Entrance 4")
+
+    # Optional arguments after the car counts
+    options = sys.argv[6:]
+    width = int(options[options.index("--wide") + 1]) if "--wide" in options else WIDTH
+    if width not in VERSIONS:
+        print("--wide must be 8, 16 or 32")
+        sys.exit(2)
+    layer = LAYOUTS[VERSIONS[width]]
+
+    # Optionally take the new cars from a recorded arrival trace (see ../arrivals.py) instead of random.choices,
+    # so that runs can be repeated exactly, or record the random arrivals of this run into a trace
+    replay = None
+    recorder = None
+    if "--replay" in options or "--record" in options:
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+        import arrivals
+        if "--replay" in options:
+            replay = arrivals.Trace(options[options.index("--replay") + 1]).replay()
+        else:
+            recorder = arrivals.TraceWriter(options[options.index("--record") + 1], (J1_CHANCE, J2_CHANCE, J3_CHANCE, J4_CHANCE))
+            atexit.register(recorder.close) # the loop only ends by exiting
+
+    # Initial values to be passed onto the packet's fields.
+    # While we have defined default values above, since we are feeding output from the previous iteration into the inputs of the next iteration,
+    # and we are using the same variables, these variables need to be initialised for the first iteration.
+    old_green = 0x01 # initialise which entrance is green
+    new_green = 0x01 # initialise for the case when we change light
+    junction_timer = 0 # initialise junction_timer
+    consecutive_timer = 0 # initialise consecutive_timer
+    new_green_car = 0 # initialise the number of new cars entering the green entrance
+
+    # Iterate to model the traffic flow over discretised timestamps
+    while True:
+        try:
+            # Stop before a count wraps around in the header
+            check_fits(width, J1_car = j1_car, J2_car = j2_car, J3_car = j3_car, J4_car = j4_car,
+                       Junction_Timer = junction_timer, Consecutive_Timer = consecutive_timer, New_green_car = new_green_car)
+
+            # Establish the destination of packet, Ethernet type to use, and any variables to send with non-default values
+            pkt = Ether(dst='e4:5f:01:84:8c:5e', type=0x1234) / layer(J1_car = j1_car,
+                                                                      J2_car = j2_car,
+                                                                      J3_car = j3_car,
+                                                                      J4_car = j4_car,
+                                                                      Green_Light = new_green,
+                                                                      Junction_Timer = junction_timer,
+                                                                      Consecutive_Timer = consecutive_timer,
+                                                                      New_green_car = new_green_car)
+            pkt = pkt/' '
+            #pkt.show()
+            resp = srp1(pkt, iface=iface, timeout=5, verbose=False)
+            if resp:
+                # Get a response from the interface and place into variable for easy access
+                p4traffic = resp[P4Traffic]
+                if p4traffic:
+                    # if the green light changed entrances, then update what the new green light is, and what the previous green light was
+                    if p4traffic.Green_Light != old_green:
+                        new_green = p4traffic.Green_Light
+                        old_green = p4traffic.Green_Light
+
+                    # simulate the movement of cars
+                    newcar, junction_timer, consecutive_timer = simulate(p4traffic.Green_Car, p4traffic.Junction_Timer, p4traffic.Consecutive_Timer) 
+                    
+                    # randomly decide whether or not to add a car into each of the junction entrances
+                    if replay is not None:
+                        arrived = next(replay, None)
+                        if arrived is None:
+                            print("End of arrival trace")
+                            sys.exit(0)
+                        addn_j1_car, addn_j2_car, addn_j3_car, addn_j4_car = arrived
+                    else:
+                        addn_j1_car = random.choices([0, 1], weights=[100-J1_CHANCE, J1_CHANCE])[0]
+                        addn_j2_car = random.choices([0, 1], weights=[100-J2_CHANCE, J2_CHANCE])[0]
+                        addn_j3_car = random.choices([0, 1], weights=[100-J3_CHANCE, J3_CHANCE])[0]
+                        addn_j4_car = random.choices([0, 1], weights=[100-J4_CHANCE, J4_CHANCE])[0]
+                        if recorder is not None:
+                            recorder.add((addn_j1_car, addn_j2_car, addn_j3_car, addn_j4_car))
+                    
+                    # after simulation, update the number of cars on the green entrance
+                    # moreover, update the number of new cars entering the green entrance
+                    if p4traffic.Green_Light == 0x01:
+                        j1_car = newcar
+                        new_green_car = addn_j1_car
+                    elif p4traffic.Green_Light == 0x02:
+                        j2_car = newcar
+                        new_green_car = addn_j2_car
+                    elif p4traffic.Green_Light == 0x03:
+                        j3_car = newcar
+                        new_green_car = addn_j3_car
+                    elif p4traffic.Green_Light == 0x04:
+                        j4_car = newcar
+                        new_green_car = addn_j4_car
+
+                    # print out the remaining cars at each entrance to the junction, before new cars have entered
+                    print(j1_car, j2_car, j3_car, j4_car)
+                    time.sleep(SLEEP_TIME) # additional sleep to help read the CLI output
+                    
+                    # add the new cars to the current number of cars
+                    j1_car += addn_j1_car
+                    j2_car += addn_j2_car
+                    j3_car += addn_j3_car
+                    j4_car += addn_j4_car
+
+                    # print out the remaining cars at each entrance to the junction, after new cars have entered
+                    # print also which entrance is green
+                    # print also what each of the timer values are                                
+                    print(f"After new cars have entered, if any:")
+                    print(j1_car, j2_car, j3_car, j4_car)
+                    print(f"green light is at {p4traffic.Green_Light}")
+                    print(f"junction timer is {p4traffic.Junction_Timer}")
+                    print(f"consecutive timer is {p4traffic.Consecutive_Timer}")
+                    # print "end of loop" and a newline to make the CLI output easier to read
+                    print(f"end of loop")
+                    print("\n")
+                    time.sleep(SLEEP_TIME) # additional sleep to help read the CLI output
+                else:
+                    print("cannot find P4Traffic header in the packet")
+
+            else:
+                print("Didn't receive response")
+                sys.exit(3)
+        except Exception as error:
+            print(error)
+            sys.exit(4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import time
+import atexit
+import random
+
+# Minimal scapy-compatible codec (../../scripts/p4pkt.py): scapy itself is only imported by pkt.show()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "scripts"))
+from p4pkt import *
+
+"""
+CONSTANTS
+"""
+SLEEP_TIME = 0.5 # Amount of seconds to sleep in some of the sleep functions. Useful for reading command-line outputs
+
+# Percentage chance at each iteration this junction will get a new car incoming
+J1_CHANCE = 30
+J2_CHANCE = 70
+J3_CHANCE = 60
+J4_CHANCE = 50
+
+# Operations of the stateful protocol (see traffic.p4)
+OP_STEP = 0  # Run one step of the junction with the new cars in Arrivals
+OP_ADD = 1   # Add Green_Car cars to entrance Green_Light
+OP_RESET = 2 # Clear the state of the junction
+
+
+
+class P4Traffic(Packet):
+    """
+    Defines the format of the sent packet. The switch keeps the state of each junction, so the packet only carries
+    the junction ID and the new cars; the switch fills in the green light and the cars there.
+    """
+    name = "P4Traffic"
+    fields_desc = [ StrFixedLenField("P", "P", length=1),
+                    StrFixedLenField("Four", "4", length=1),
+                    XByteField("version", 0x04),
+                    XByteField("Junction", 0x00),      # Junction ID, the index into the switch's registers
+                    BitField("Op", OP_STEP, 4),        # What the switch should do
+                    BitField("Arrivals", 0x0, 4),      # One bit per entrance (bit 0 = entrance 1): a new car arrived there
+                    XByteField("Green_Light", 0x00),   # Which entrance the green light is at now
+                    ShortField("Green_Car", 0),        # How many cars there are at the greenlit entrance
+                    XByteField("Cleared", 0x00)]       # How many cars went through the junction in this step
+
+bind_layers(Ether, P4Traffic, type=0x1234)
+
+def exchange(pkt, iface, local):
+    """
+    Sends a packet and returns the reply: from the switch, or with --local from the Python model of the
+    switch pipeline (../models.py), to try the protocol without a switch.
+    """
+    if local is not None:
+        reply = local.process(raw(pkt))
+        return Ether(reply) if reply else None
+    return srp1(pkt, iface=iface, timeout=5, verbose=False)
+
+def main():
+    """
+    Main function
+    """
+    iface = "enx0c37965f8a0f"
+
+    # Take in command line arguments, with error checking that the correct arguments are given
+    # The 3rd up to 6th arguments describe the initial number of cars at each junction entrance
+    if len(sys.argv) < 6:
+        print("Usage: python traffic.py [add|quit] <junction1_car> <junction2_car> <junction3_car> <junction4_car> [--junction <id>] [--local] [--replay|--record <trace file>]")
+        sys.exit(2)
+    elif sys.argv[1] == "quit":
+        sys.exit(1)
+    elif sys.argv[1] != "add":
+        print("First command line argument is 'add' for normal usage")
+    else:
+        j1_car = int(sys.argv[2])
+        j2_car = int(sys.argv[3])
+        j3_car = int(sys.argv[4])
+        j4_car = int(sys.argv[5])
+
+    # Optional arguments after the car counts
+    options = sys.argv[6:]
+    junction = int(options[options.index("--junction") + 1]) if "--junction" in options else 0
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    local = None
+    if "--local" in options:
+        import models
+        local = models.StatefulSwitch()
+
+    # Optionally take the new cars from a recorded arrival trace (see ../arrivals.py) instead of random.choices,
+    # so that runs can be repeated exactly, or record the random arrivals of this run into a trace
+    replay = None
+    recorder = None
+    if "--replay" in options or "--record" in options:
+        import arrivals
+        if "--replay" in options:
+            replay = arrivals.Trace(options[options.index("--replay") + 1]).replay()
+        else:
+            recorder = arrivals.TraceWriter(options[options.index("--record") + 1], (J1_CHANCE, J2_CHANCE, J3_CHANCE, J4_CHANCE))
+            atexit.register(recorder.close) # the loop only ends by exiting
+
+    # The switch keeps the cars, so start from a clean junction and send it the initial cars once
+    eth = Ether(dst='e4:5f:01:84:8c:5e', type=0x1234)
+    setup = [P4Traffic(Junction = junction, Op = OP_RESET)]
+    for entrance, cars in enumerate([j1_car, j2_car, j3_car, j4_car], 1):
+        if cars:
+            setup.append(P4Traffic(Junction = junction, Op = OP_ADD, Green_Light = entrance, Green_Car = cars))
+    for request in setup:
+        if not exchange(eth/request/' ', iface, local):
+            print("Didn't receive response")
+            sys.exit(3)
+
+    # Confirmation about the number of cars added at each junction entrance
+    print(f"Added successfully to junction {junction}:")
+    print(f"{j1_car} cars to Entrance 1\n{j2_car} cars to Entrance 2\n{j3_car} cars to Entrance 3\n{j4_car} cars to Entrance 4")
+
+    addn_car = [0, 0, 0, 0] # new cars at each entrance since the last step
+
+    # Iterate to model the traffic flow over discretised timestamps
+    while True:
+        try:
+            # randomly decide whether or not a car comes to each of the junction entrances in this step
+            if replay is not None:
+                arrived = next(replay, None)
+                if arrived is None:
+                    print("End of arrival trace")
+                    sys.exit(0)
+                addn_car = list(arrived)
+            else:
+                addn_car = [random.choices([0, 1], weights=[100-chance, chance])[0]
+                            for chance in (J1_CHANCE, J2_CHANCE, J3_CHANCE, J4_CHANCE)]
+                if recorder is not None:
+                    recorder.add(addn_car)
+
+            # Only the new cars are sent: the switch lets the cars through and keeps the counts
+            arrivals = addn_car[0] | addn_car[1] << 1 | addn_car[2] << 2 | addn_car[3] << 3
+            pkt = eth / P4Traffic(Junction = junction, Op = OP_STEP, Arrivals = arrivals)
+            pkt = pkt/' '
+            #pkt.show()
+            resp = exchange(pkt, iface, local)
+            if resp:
+                # Get a response from the interface and place into variable for easy access
+                p4traffic = resp[P4Traffic]
+                if p4traffic:
+                    # print out which entrance is green, the cars that went through and the cars left there
+                    print(f"new cars: {addn_car}")
+                    print(f"green light is at {p4traffic.Green_Light}")
+                    print(f"{p4traffic.Cleared} cars went through, {p4traffic.Green_Car} cars left at the green light")
+                    # print "end of loop" and a newline to make the CLI output easier to read
+                    print(f"end of loop")
+                    print("\n")
+                    time.sleep(SLEEP_TIME) # additional sleep to help read the CLI output
+                else:
+                    print("cannot find P4Traffic header in the packet")
+
+            else:
+                print("Didn't receive response")
+                sys.exit(3)
+        except Exception as error:
+            print(error)
+            sys.exit(4)
+
+if __name__ == '__main__':
+    main()
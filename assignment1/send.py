@@ -1,7 +1,11 @@
 #!/usr/bin/python
 
-from scapy.all import Ether, IP, sendp, get_if_hwaddr, get_if_list, TCP, Raw, UDP
+import os
 import sys
+
+# Minimal scapy-compatible codec (../scripts/p4pkt.py): scapy itself is only imported by p.show()
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from p4pkt import Ether, IP, sendp, get_if_hwaddr, get_if_list, TCP, Raw, UDP
 import random, string
 
 
@@ -0,0 +1,142 @@
+"""
+Level-of-detail downsampling of long time series before plotting.
+
+A figure cannot show more than one value per horizontal pixel, so handing
+hours of per-interval samples to matplotlib only costs time and file size.
+These functions reduce a series to a few points per pixel column while keeping
+the visual peaks and drops:
+
+- minmax: keeps the minimum and the maximum of every bucket, so every spike
+  and dip that would be visible survives (best for bandwidth/drops).
+- lttb: Largest-Triangle-Three-Buckets, one point per bucket chosen to keep
+  the shape of the line (best for smooth line plots).
+
+auto() and auto_stairs() pick the number of buckets from the width of the axes
+in pixels and return the reduction ratio (input points / output points).
+"""
+
+import numpy as np
+
+POINTS_PER_PIXEL = 2 # Buckets per pixel column of the axes
+
+
+def _buckets(n, buckets):
+    """
+    Edges of `buckets` contiguous, near-equal index ranges covering range(n).
+    """
+    return np.linspace(0, n, buckets + 1).astype(np.intp)
+
+
+def minmax_indices(y, buckets):
+    """
+    Sorted indices of the minimum and maximum of y in each bucket, plus the
+    first and last sample.
+    """
+    n = len(y)
+    if buckets <= 0 or n <= 2 * buckets:
+        return np.arange(n)
+    size = -(-n // buckets) # ceil
+    padded = np.empty(size * buckets)
+    padded[:n] = y
+    padded[n:] = y[-1]
+    rows = padded.reshape(buckets, size)
+    start = np.arange(buckets) * size
+    lo = np.minimum(start + rows.argmin(axis=1), n - 1)
+    hi = np.minimum(start + rows.argmax(axis=1), n - 1)
+    return np.unique(np.concatenate(([0, n - 1], lo, hi)))
+
+
+def minmax(x, y, buckets):
+    """
+    Returns (x, y) reduced to at most 2 * buckets + 2 points.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    i = minmax_indices(y, buckets)
+    return x[i], y[i]
+
+
+def lttb(x, y, threshold):
+    """
+    Returns (x, y) reduced to `threshold` points with Largest-Triangle-Three-Buckets.
+    The first and last points are always kept. The loop runs once per output
+    point, the search inside each bucket is vectorized.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    # average of every bucket, used as the third vertex of the triangles
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+    chosen = np.empty(threshold, dtype=np.intp)
+    chosen[0] = 0
+    chosen[-1] = n - 1
+    a = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        cx, cy = avg_x[b + 1], avg_y[b + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        chosen[b + 1] = a
+    return x[chosen], y[chosen]
+
+
+def pixel_width(ax=None):
+    """
+    Width of the axes in pixels (the current axes by default).
+    """
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    return max(int(ax.get_window_extent().width), 1)
+
+
+def auto(x, y, ax=None, method="minmax"):
+    """
+    Downsamples (x, y) to the resolution of the axes.
+    Returns (x, y, ratio); series that already fit are returned unchanged with ratio 1.
+    """
+    n = len(y)
+    buckets = pixel_width(ax) * POINTS_PER_PIXEL
+    if method == "lttb":
+        x2, y2 = lttb(x, y, buckets)
+    else:
+        x2, y2 = minmax(x, y, buckets // 2)
+    return x2, y2, n / max(len(y2), 1)
+
+
+def auto_stairs(values, edges, ax=None):
+    """
+    Downsamples the arguments of plt.stairs(values, edges) to the resolution of
+    the axes. Each bucket becomes two steps, at its minimum and maximum in the
+    order they occur, so peaks and drops stay visible.
+    Returns (values, edges, ratio).
+    """
+    values = np.asarray(values, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    n = len(values)
+    buckets = pixel_width(ax) * POINTS_PER_PIXEL // 2
+    if n <= 2 * buckets:
+        return values, edges, 1.0
+    bounds = _buckets(n, buckets)
+    lo = np.minimum.reduceat(values, bounds[:-1])
+    hi = np.maximum.reduceat(values, bounds[:-1])
+    # position of the first minimum and maximum of each bucket, to keep their order
+    bucket = np.repeat(np.arange(buckets), np.diff(bounds))
+    index = np.arange(n)
+    lo_at = np.minimum.reduceat(np.where(values == lo[bucket], index, n), bounds[:-1])
+    hi_at = np.minimum.reduceat(np.where(values == hi[bucket], index, n), bounds[:-1])
+    min_first = lo_at <= hi_at
+    first = np.where(min_first, lo, hi)
+    second = np.where(min_first, hi, lo)
+    new_values = np.column_stack((first, second)).ravel()
+    left = edges[bounds[:-1]]
+    right = edges[bounds[1:]]
+    new_edges = np.append(np.column_stack((left, (left + right) / 2)).ravel(), right[-1])
+    return new_values, new_edges, n / len(new_values)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+"""
+Live plot of a running iperf or ping measurement.
+
+Follows a log file that is still being written (e.g. `iperf3 -c ... | tee iperf3.log`
+or `ping ... > ping_log1.txt`), parses only the bytes appended since the last
+poll and redraws only the data artist with blitting. The axes are redrawn in
+full only when the data outgrows them, so it can run next to the measurement
+on the Raspberry Pi.
+
+Usage:
+    python3 live_plot.py iperf3.log
+    python3 live_plot.py --kind line --interval 0.5 ping_log1.txt
+"""
+
+import argparse
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+import logs
+
+POLL_INTERVAL = 1.0 # Seconds between two reads of the log file
+GROWTH = 1.5 # Factor the axes limits grow by when the data outgrows them
+
+
+class LogTail:
+    """
+    Incrementally reads a growing text file. poll() returns the complete lines
+    appended since the previous call; a trailing partial line is kept until the
+    rest of it is written.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.offset = 0
+        self.partial = b""
+
+    def poll(self):
+        try:
+            size = os.path.getsize(self.filename)
+        except FileNotFoundError:
+            return []
+        if size < self.offset:
+            # the file was truncated or recreated, start from the beginning
+            self.offset = 0
+            self.partial = b""
+        if size == self.offset:
+            return []
+        with open(self.filename, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        self.offset += len(data)
+        data = self.partial + data
+        end = data.rfind(b"\n") + 1
+        self.partial = data[end:]
+        return data[:end].decode(errors="replace").splitlines()
+
+
+class Series:
+    """
+    Turns new log lines into plot samples, detecting the log format from its
+    first line: ping logs give (icmp reply number, RTT), iperf logs give
+    (interval end, bandwidth) of the first stream.
+    Samples go into preallocated buffers that double when full, and x/y are
+    views of them, so appending does not copy the samples already plotted.
+    """
+
+    def __init__(self, fmt="auto", capacity=1024):
+        self.fmt = fmt
+        self.buffer = np.empty((2, capacity))
+        self.n = 0
+        self.seen = set()
+        self.stream = None
+
+    @property
+    def x(self):
+        return self.buffer[0, :self.n]
+
+    @property
+    def y(self):
+        return self.buffer[1, :self.n]
+
+    def append(self, x, y):
+        if self.n == self.buffer.shape[1]:
+            # the artist may still hold a view of the old buffer, so never resize in place
+            buffer = np.empty((2, 2 * self.n))
+            buffer[:, :self.n] = self.buffer
+            self.buffer = buffer
+        self.buffer[0, self.n] = x
+        self.buffer[1, self.n] = y
+        self.n += 1
+
+    def feed(self, lines):
+        if self.fmt == "auto" and lines:
+            self.fmt = "ping" if lines[0].startswith("PING") else "iperf"
+        before = self.n
+        if self.fmt == "ping":
+            for rtt in logs.ping_rtts(lines):
+                self.append(self.n + 1, rtt)
+        elif self.fmt == "iperf":
+            for stream, start, end, bandwidth in logs.iperf_intervals(lines, self.seen):
+                if self.stream is None:
+                    self.stream = stream
+                if stream == self.stream:
+                    self.append(end, bandwidth)
+        return self.n - before
+
+
+class LivePlot:
+    """
+    Keeps one stairs (one step per sample, like plot.py) or line artist up to
+    date, blitting it over a cached background of the axes.
+    """
+
+    def __init__(self, kind, label, xlabel, ylabel, title):
+        self.kind = kind
+        self.fig, self.ax = plt.subplots()
+        if kind == "stairs":
+            self.artist = self.ax.stairs([], [0], label=label, animated=True)
+        else:
+            (self.artist,) = self.ax.plot([], [], label=label, animated=True)
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel(ylabel)
+        self.ax.set_title(title)
+        self.ax.legend()
+        self.ax.set_xlim(0, 10)
+        self.ax.set_ylim(0, 1)
+        self.background = None
+        self.fig.canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        # cache everything except the animated artist after every full redraw
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.ax.draw_artist(self.artist)
+
+    def fits(self, series):
+        xmax = series.n if self.kind == "stairs" else series.x[-1]
+        ymax = series.y.max()
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        if xmax <= x1 and ymax <= y1:
+            return True
+        self.ax.set_xlim(x0, max(x1, xmax * GROWTH))
+        self.ax.set_ylim(y0, max(y1, ymax * GROWTH))
+        return False
+
+    def update(self, series):
+        if self.kind == "stairs":
+            self.artist.set_data(series.y, np.arange(series.n + 1))
+        else:
+            self.artist.set_data(series.x, series.y)
+        if not self.fits(series) or self.background is None:
+            # the axes changed, so the cached background is stale
+            self.fig.canvas.draw()
+        else:
+            self.fig.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.artist)
+            self.fig.canvas.blit(self.fig.bbox)
+        self.fig.canvas.flush_events()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live plot of a growing iperf or ping log")
+    parser.add_argument("filename")
+    parser.add_argument("--format", choices=["auto", "iperf", "ping"], default="auto")
+    parser.add_argument("--kind", choices=["stairs", "line"], default="stairs")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="seconds between polls")
+    parser.add_argument("--label", default=None)
+    parser.add_argument("--title", default="Live measurement")
+    parser.add_argument("--fig-name", default=None, help="save the figure here when the window is closed")
+    args = parser.parse_args()
+
+    tail = LogTail(args.filename)
+    series = Series(args.format)
+    series.feed(tail.poll())
+    if series.fmt == "ping":
+        xlabel, ylabel = "ICMP reply", "RTT (ms)"
+    else:
+        xlabel, ylabel = "Time/Interval (s)", "Bandwidth (Mbits/sec)"
+    live = LivePlot(args.kind, args.label or args.filename, xlabel, ylabel, args.title)
+    plt.show(block=False)
+    live.fig.canvas.draw()
+    if series.n:
+        live.update(series)
+
+    while plt.fignum_exists(live.fig.number):
+        if series.feed(tail.poll()):
+            live.update(series)
+        # wait for the next poll without redrawing the figure (unlike plt.pause)
+        live.fig.canvas.start_event_loop(args.interval)
+
+    if args.fig_name:
+        live.artist.set_animated(False)
+        live.fig.savefig(args.fig_name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Line parsers for the raw ping/iperf output saved in this folder, and for the
+space-delimited processed_*.txt/.log files that plot.py reads.
+Every parser takes an iterable of lines and yields values one at a time, so a
+file is never loaded into memory as a whole.
+"""
+
+import re
+
+PING_PATTERN = re.compile(r"time[=<]([0-9.]+) ms")
+# "[  5]   1.00-2.00   sec   112 MBytes   941 Mbits/sec" (iperf3) or
+# "[  1] 1.0000-2.0000 sec   112 MBytes   942 Mbits/sec" (iperf2)
+IPERF_PATTERN = re.compile(r"^\[\s*(\w+)\]\s+([0-9.]+)-\s*([0-9.]+)\s+sec\s+[0-9.]+\s+\w?Bytes\s+([0-9.]+)\s+(\w?)bits/sec")
+CONNECTED_PATTERN = re.compile(r"^\[\s*(\w+)\] local .* connected")
+UNITS = {"": 1e-6, "K": 1e-3, "M": 1.0, "G": 1e3}
+
+
+def ping_rtts(lines):
+    """
+    Yields the RTT in ms of every reply line of a `ping` log, e.g.
+    "64 bytes from 192.168.10.1: icmp_seq=1 ttl=64 time=0.599 ms".
+    The header and the summary at the end of the log are skipped.
+    """
+    for line in lines:
+        match = PING_PATTERN.search(line)
+        if match:
+            yield float(match.group(1))
+
+
+def iperf_intervals(lines, seen=None):
+    """
+    Yields (stream, start, end, bandwidth) for every per-interval line of an
+    iperf or iperf3 log, with the bandwidth in Mbits/sec.
+    The end-of-test summaries (and [SUM] lines) are skipped: a summary is the
+    second line of a stream that starts at 0, where a "connected" line starts
+    a new stream even if iperf reuses its ID. Pass the same `seen` set to
+    successive calls to keep parsing one log in chunks.
+    """
+    if seen is None:
+        seen = set()
+    for line in lines:
+        match = CONNECTED_PATTERN.match(line)
+        if match:
+            seen.discard(match.group(1))
+            continue
+        match = IPERF_PATTERN.match(line)
+        if not match or match.group(1) == "SUM" or "sender" in line or "receiver" in line:
+            continue
+        stream = match.group(1)
+        start = float(match.group(2))
+        if start == 0 and stream in seen:
+            continue
+        seen.add(stream)
+        yield stream, start, float(match.group(3)), float(match.group(4)) * UNITS[match.group(5)]
+
+
+def column(lines, index=-1):
+    """
+    Yields one column of a space-delimited data file (the last one by default,
+    which is the y-axis value in the processed files). Blank lines are skipped.
+    """
+    for line in lines:
+        fields = line.split()
+        if fields:
+            yield float(fields[index])
+
+
+def samples(filename):
+    """
+    Yields the samples of a log file, picking the parser from its contents:
+    raw ping logs give their RTTs, anything else is read as processed data.
+    """
+    with open(filename) as f:
+        first = f.readline()
+        if first.startswith("PING"):
+            yield from ping_rtts(f)
+        else:
+            yield from column([first])
+            yield from column(f)
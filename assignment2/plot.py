@@ -1,6 +1,7 @@
 # !/usr/bin/python3
 import numpy as np
 import matplotlib.pyplot as plt
+from downsample import auto_stairs
 
 # parameters to modify
 filename="processed_iperf3.log"
@@ -10,15 +11,25 @@ ylabel = 'Bandwidth'
 title='Bandwidth at Each Interval'
 fig_name='iPerf3 Task 1'
 bins=10 #adjust the number of bins to your plot
+downsample=True #reduce long series to the figure's resolution before plotting (see downsample.py)
 
 t = np.loadtxt(filename, delimiter=" ", dtype="float")
 #index_array = [i + 1 for i in range(len(t))]
 #plt.plot(np.log10([100, 1000, 100000]), [0, 0, 0], '-rx')
 #plt.plot(index_array, t, label=label)  # Plot some data on the (implicit) axes.
-plt.stairs(t[:, 1], range(len(t[:, 1]) + 1), baseline = 880) # Plot bandwidth at each interval
+values, edges = t[:, 1], np.arange(len(t[:, 1]) + 1)
+if downsample:
+    # keeps the min and max of each pixel column, so peaks and drops stay visible
+    values, edges, ratio = auto_stairs(values, edges)
+    if ratio > 1:
+        print(f"Downsampled {len(t)} samples by {ratio:.1f}x")
+plt.stairs(values, edges, baseline = 880) # Plot bandwidth at each interval
 
 #Comment the line above and uncomment the line below to plot a CDF
 #plt.hist(t[:,1], bins, density=True, histtype='step', cumulative=True, label=label)
+#For long captures, uncomment the lines below instead: the CDF is drawn from a bounded-memory sketch (see sketch.py)
+#from sketch import LatencySketch
+#LatencySketch.from_file(filename).plot_cdf(label=label)
 plt.xlabel(xlabel)
 plt.ylabel(ylabel)
 plt.title(title)
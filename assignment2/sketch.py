@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+"""
+Bounded-memory latency percentiles and CDFs.
+
+plot.py builds a CDF by loading the whole data column and calling plt.hist(),
+which does not scale to long ping captures. LatencySketch is an HDR-histogram
+style alternative: samples are counted into geometrically growing buckets, so
+memory is fixed by the trackable range (a few KB) no matter how many samples
+are added, and every quantile is reported within PRECISION relative error.
+Sketches of the same shape can be merged, so runs can be combined afterwards.
+
+Usage:
+    python3 sketch.py ping_log1.txt ping_log2.txt
+    python3 sketch.py -o run1.sketch ping_log1.txt
+    python3 sketch.py --plot latency_cdf.png run1.sketch run2.sketch
+"""
+
+import argparse
+import math
+import struct
+import sys
+from array import array
+
+import logs
+
+# Defaults for the trackable range, in ms, and the relative error of a quantile.
+# Samples outside the range are clamped into the first/last bucket.
+LOWEST = 0.001
+HIGHEST = 60000.0
+PRECISION = 0.01
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+HEADER = struct.Struct("<4sdddQddd")
+MAGIC = b"LSK1"
+
+
+class LatencySketch:
+    """
+    Constant-memory quantile sketch. Bucket i holds the samples in
+    (gamma^(i+offset-1), gamma^(i+offset)], where gamma = (1+p)/(1-p).
+    """
+
+    def __init__(self, lowest=LOWEST, highest=HIGHEST, precision=PRECISION):
+        if not 0 < lowest < highest:
+            raise ValueError("need 0 < lowest < highest")
+        if not 0 < precision < 1:
+            raise ValueError("precision must be between 0 and 1")
+        self.lowest = lowest
+        self.highest = highest
+        self.precision = precision
+        self.gamma = (1 + precision) / (1 - precision)
+        self.log_gamma = math.log(self.gamma)
+        self.offset = math.ceil(math.log(lowest) / self.log_gamma)
+        size = math.ceil(math.log(highest) / self.log_gamma) - self.offset + 1
+        self.counts = array("Q", bytes(8 * size))
+        self.total = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+
+    def _index(self, value):
+        if value <= self.lowest:
+            return 0
+        i = math.ceil(math.log(value) / self.log_gamma) - self.offset
+        return min(i, len(self.counts) - 1)
+
+    def _value(self, i):
+        """
+        Representative value of bucket i: the point with equal relative
+        distance to both bucket edges.
+        """
+        return 2 * self.gamma ** (i + self.offset) / (self.gamma + 1)
+
+    def add(self, value, count=1):
+        self.counts[self._index(value)] += count
+        self.total += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def update(self, values):
+        """
+        Adds every value of an iterable, e.g. one of the generators in logs.py.
+        """
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """
+        Adds the samples of another sketch with the same range and precision.
+        """
+        if (self.lowest, self.highest, self.precision) != (other.lowest, other.highest, other.precision):
+            raise ValueError("can only merge sketches with the same range and precision")
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def mean(self):
+        return self.sum / self.total if self.total else math.nan
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs):
+        """
+        Returns the value at each quantile in qs (0 <= q <= 1), in one walk
+        over the buckets. The exact min and max are returned for q = 0 and 1.
+        """
+        if not self.total:
+            return [math.nan] * len(qs)
+        order = sorted(range(len(qs)), key=lambda k: qs[k])
+        result = [math.nan] * len(qs)
+        cumulative = 0
+        k = 0
+        for i, count in enumerate(self.counts):
+            if not count:
+                continue
+            cumulative += count
+            while k < len(order) and qs[order[k]] * (self.total - 1) < cumulative:
+                value = self._value(i)
+                result[order[k]] = min(max(value, self.min), self.max)
+                k += 1
+            if k == len(order):
+                break
+        return result
+
+    def cdf(self):
+        """
+        Returns (values, fractions): the upper edge of every non-empty bucket
+        and the fraction of samples at or below it. Plot with plt.step(..., where='post').
+        """
+        values = []
+        fractions = []
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count:
+                cumulative += count
+                values.append(min(self.gamma ** (i + self.offset), self.max))
+                fractions.append(cumulative / self.total)
+        return values, fractions
+
+    def plot_cdf(self, ax=None, **kwargs):
+        """
+        Draws the CDF straight from the buckets onto ax (the current axes by default).
+        """
+        if ax is None:
+            import matplotlib.pyplot as plt
+            ax = plt.gca()
+        values, fractions = self.cdf()
+        return ax.step(values, fractions, where="post", **kwargs)
+
+    def save(self, filename):
+        with open(filename, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.lowest, self.highest, self.precision,
+                                self.total, self.min, self.max, self.sum))
+            f.write(self.counts.tobytes())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, "rb") as f:
+            magic, lowest, highest, precision, total, lo, hi, s = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{filename} is not a saved sketch")
+            sketch = cls(lowest, highest, precision)
+            counts = array("Q")
+            counts.frombytes(f.read())
+        if len(counts) != len(sketch.counts):
+            raise ValueError(f"{filename} is truncated")
+        sketch.counts = counts
+        sketch.total, sketch.min, sketch.max, sketch.sum = total, lo, hi, s
+        return sketch
+
+    @classmethod
+    def from_file(cls, filename, **kwargs):
+        """
+        Builds a sketch from a saved sketch or from a ping/processed log.
+        """
+        with open(filename, "rb") as f:
+            if f.read(len(MAGIC)) == MAGIC:
+                return cls.load(filename)
+        return cls(**kwargs).update(logs.samples(filename))
+
+
+def report(name, sketch, out=sys.stdout):
+    values = " ".join(f"{v:10.3f}" for v in sketch.quantiles(QUANTILES))
+    print(f"{name:30} {sketch.total:10} {values}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming latency percentiles from ping logs, processed logs or saved sketches")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("-o", "--output", help="save the merged sketch to this file")
+    parser.add_argument("--plot", metavar="FIG", help="save a CDF of every file to this figure")
+    parser.add_argument("--precision", type=float, default=PRECISION)
+    args = parser.parse_args()
+
+    header = " ".join(f"{'p' + format(100 * q, 'g'):>10}" for q in QUANTILES)
+    print(f"{'file':30} {'samples':>10} {header}")
+    merged = LatencySketch(precision=args.precision)
+    for filename in args.files:
+        sketch = LatencySketch.from_file(filename, precision=args.precision)
+        report(filename, sketch)
+        merged.merge(sketch)
+        if args.plot:
+            sketch.plot_cdf(label=filename)
+    if len(args.files) > 1:
+        report("merged", merged)
+
+    if args.output:
+        merged.save(args.output)
+    if args.plot:
+        import matplotlib.pyplot as plt
+        plt.xlabel("RTT (ms)")
+        plt.ylabel("CDF")
+        plt.legend()
+        plt.savefig(args.plot)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+"""
+Energy-per-bit analysis for the power-efficiency experiments.
+
+Joins the per-interval throughput of iperf runs (raw iperf/iperf3 logs or the
+processed "time bandwidth" files from assignment2) with a time-stamped
+power-meter CSV ("timestamp,watts" per line, an optional header line is skipped).
+
+The power samples are integrated once into a cumulative energy curve, and the
+energy of every iperf interval is read off that curve with np.interp at the
+interval edges. This is a sorted merge of the two series with linear
+interpolation of the power between samples, done for all intervals at once, so
+multi-hour traces are handled in one vectorized pass.
+
+Clock alignment: interval times are seconds since the iperf run started. A run
+is given as LOG@START, where START is the host clock time at the start of the
+run (e.g. `date +%s.%N` just before iperf); --offset (power meter clock minus
+host clock, in seconds) converts it to power meter time. Without START, the run
+starts at the first power sample, which is already power meter time and is
+used as it is.
+
+Usage:
+    python3 energy.py power.csv ../assignment2/iperf3.log@1715898729.9
+    python3 energy.py --offset -0.35 power.csv ../assignment2/iperf3.log@1715898729.9
+    python3 energy.py --idle 2.7 --curve load_watts.data power.csv run1.log run2.log
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assignment2"))
+import logs
+
+LOAD_BINS = 10 # Number of throughput bins of the watts-versus-load curve
+
+
+def load_power(filename):
+    """
+    Returns (timestamps, watts) of a power-meter CSV, sorted by time.
+    """
+    with open(filename) as f:
+        first = f.readline()
+    try:
+        [float(x) for x in first.split(",")[:2]]
+        skip = 0
+    except ValueError:
+        skip = 1
+    data = np.loadtxt(filename, delimiter=",", usecols=(0, 1), skiprows=skip, ndmin=2)
+    order = np.argsort(data[:, 0], kind="stable")
+    return data[order, 0], data[order, 1]
+
+
+def load_intervals(filename):
+    """
+    Returns (start, end, Mbits/sec) arrays of the intervals of one iperf run.
+    Raw logs use the first stream; processed files give the end of each
+    interval, and intervals are assumed to be back to back from 0.
+    """
+    with open(filename) as f:
+        rows = list(logs.iperf_intervals(f))
+    if rows:
+        stream = rows[0][0]
+        rows = np.array([r[1:] for r in rows if r[0] == stream])
+        return rows[:, 0], rows[:, 1], rows[:, 2]
+    data = np.loadtxt(filename, ndmin=2)
+    end = data[:, 0]
+    return np.concatenate(([0.0], end[:-1])), end, data[:, -1]
+
+
+def cumulative_energy(t, watts):
+    """
+    Energy in joules from the first sample up to each sample, trapezoid rule.
+    """
+    e = np.empty_like(watts)
+    e[0] = 0.0
+    np.cumsum((watts[1:] + watts[:-1]) * 0.5 * np.diff(t), out=e[1:])
+    return e
+
+
+def interval_energy(t, energy, start, end):
+    """
+    Joules spent in each [start, end] interval, with the power linearly
+    interpolated between samples. Intervals outside the power trace are NaN.
+    """
+    inside = (start >= t[0]) & (end <= t[-1])
+    joules = np.interp(end, t, energy) - np.interp(start, t, energy)
+    return np.where(inside, joules, np.nan)
+
+
+def analyze_run(t, energy, filename, start, idle=0.0):
+    """
+    Returns a dict of per-interval arrays (start, end, mbps, joules, watts,
+    joules_per_bit) for one run, with interval times in the power clock.
+    Power below `idle` is not counted when idle is given (dynamic energy only).
+    """
+    s, e, mbps = load_intervals(filename)
+    s = s + start
+    e = e + start
+    joules = interval_energy(t, energy, s, e) - idle * (e - s)
+    bits = mbps * 1e6 * (e - s)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_bit = np.where(bits > 0, joules / bits, np.nan)
+    return {"start": s, "end": e, "mbps": mbps, "joules": joules,
+            "watts": joules / (e - s), "joules_per_bit": per_bit}
+
+
+def load_curve(runs, bins=LOAD_BINS):
+    """
+    Mean watts per throughput bin over the intervals of all runs.
+    Returns (bin centres in Mbits/sec, watts, number of intervals).
+    """
+    mbps = np.concatenate([r["mbps"] for r in runs])
+    watts = np.concatenate([r["watts"] for r in runs])
+    keep = ~np.isnan(watts)
+    mbps, watts = mbps[keep], watts[keep]
+    if not len(mbps):
+        return np.array([]), np.array([]), np.array([])
+    edges = np.linspace(0, mbps.max(), bins + 1)
+    index = np.clip(np.searchsorted(edges, mbps, side="right") - 1, 0, bins - 1)
+    counts = np.bincount(index, minlength=bins)
+    sums = np.bincount(index, weights=watts, minlength=bins)
+    used = counts > 0
+    centres = (edges[:-1] + edges[1:]) / 2
+    return centres[used], sums[used] / counts[used], counts[used]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Joules per bit and watts versus load from iperf logs and a power-meter CSV")
+    parser.add_argument("power", help="CSV of timestamp,watts")
+    parser.add_argument("runs", nargs="+", metavar="LOG[@START]",
+                        help="iperf log, with the host clock time at the start of the run")
+    parser.add_argument("--offset", type=float, default=0.0, help="power meter clock minus host clock, in seconds")
+    parser.add_argument("--idle", type=float, default=0.0, help="idle power in watts to subtract")
+    parser.add_argument("--bins", type=int, default=LOAD_BINS)
+    parser.add_argument("--curve", metavar="FILE", help="write '<Mbits/sec> <watts>' lines to FILE")
+    args = parser.parse_args()
+
+    t, watts = load_power(args.power)
+    if len(t) < 2:
+        print("Need at least two power samples")
+        sys.exit(1)
+    energy = cumulative_energy(t, watts)
+
+    runs = []
+    print(f"{'run':30} {'seconds':>8} {'Mbits/s':>8} {'watts':>7} {'joules':>9} {'nJ/bit':>8}")
+    for run in args.runs:
+        filename, _, start = run.partition("@")
+        # START is host time; the default (first power sample) is meter time already
+        start = float(start) + args.offset if start else t[0]
+        r = analyze_run(t, energy, filename, start, args.idle)
+        runs.append(r)
+        ok = ~np.isnan(r["joules"])
+        if not ok.any():
+            print(f"{filename:30} no overlap with the power trace")
+            continue
+        seconds = np.sum(r["end"][ok] - r["start"][ok])
+        joules = np.sum(r["joules"][ok])
+        bits = np.sum(r["mbps"][ok] * 1e6 * (r["end"][ok] - r["start"][ok]))
+        print(f"{filename:30} {seconds:8.1f} {bits / seconds / 1e6:8.1f} {joules / seconds:7.2f} "
+              f"{joules:9.1f} {joules / bits * 1e9 if bits else float('nan'):8.3f}")
+
+    centres, curve, counts = load_curve(runs, args.bins)
+    print()
+    print(f"{'Mbits/s':>8} {'watts':>7} {'intervals':>9}")
+    for c, w, n in zip(centres, curve, counts):
+        print(f"{c:8.1f} {w:7.2f} {n:9}")
+    if args.curve:
+        np.savetxt(args.curve, np.column_stack((centres, curve)), fmt="%g", delimiter=" ")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+"""
+Offline reference model of reflector.p4.
+
+Replays a pcap (e.g. a capture of send.py traffic, or assignment3/captured.pcap)
+through the same match-action logic as MyIngress in reflector.p4:
+
+    if (hdr.ethernet.isValid()) src_mac_drop.apply();
+
+where src_mac_drop is an exact match on the source MAC with the actions
+swap_mac_addresses (the default: swap the MACs and send the frame back out of
+its ingress port), drop and NoAction (the frame leaves unchanged on port 0,
+the default egress_spec of v1model). Table entries are read from a
+simple_switch_CLI commands file, e.g.
+
+    table_add MyIngress.src_mac_drop MyIngress.drop CA:FE:CA:FE:CA:FE =>
+
+Frames are processed in batches with NumPy: the MAC addresses of a whole batch
+are packed into uint64 arrays, looked up with searchsorted against the sorted
+table keys, and the forwarded frames are gathered (with their MACs swapped)
+into the output pcap in one indexing operation per batch.
+
+Usage:
+    python3 reflector_model.py capture.pcap
+    python3 reflector_model.py --commands commands.txt -o reflected.pcap capture.pcap
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+import controlplane
+from pcapstream import PcapReader
+
+TABLE = "src_mac_drop"
+TABLE_SIZE = 1024 # size of src_mac_drop in reflector.p4
+BATCH_SIZE = 65536 # Frames per batch
+
+# action codes
+SWAP = 0
+DROP = 1
+NO_ACTION = 2
+ACTIONS = {"swap_mac_addresses": SWAP, "drop": DROP, "NoAction": NO_ACTION}
+ACTION_NAMES = {code: name for name, code in ACTIONS.items()}
+
+SHIFTS = np.arange(40, -8, -8, dtype=np.uint64) # big-endian bytes of a 48-bit MAC
+BYTES6 = np.arange(6)
+
+
+class SrcMacTable:
+    """
+    The src_mac_drop table: sorted keys and their action codes, so a whole
+    batch of source MACs is matched with one searchsorted.
+    """
+
+    def __init__(self, entries=None, default=SWAP):
+        entries = dict(entries or {})
+        if len(entries) > TABLE_SIZE:
+            print(f"Warning: {len(entries)} entries, but src_mac_drop only holds {TABLE_SIZE}")
+        self.keys = np.array(sorted(entries), dtype=np.uint64)
+        self.actions = np.array([entries[k] for k in sorted(entries)], dtype=np.uint8)
+        self.default = default
+
+    @classmethod
+    def from_commands(cls, lines):
+        """
+        Builds the table from the table_add (and table_set_default) lines of a commands file.
+        """
+        wanted, others = controlplane.read_commands(lines)
+        entries = {}
+        for (table, key), entry in wanted.items():
+            if table.split(".")[-1] == TABLE:
+                entries[key[0]] = ACTIONS[entry.action.split(".")[-1]]
+        default = SWAP
+        for line in others:
+            args = line.split()
+            if args[0] == "table_set_default" and args[1].split(".")[-1] == TABLE:
+                default = ACTIONS[args[2].split(".")[-1]]
+        return cls(entries, default)
+
+    def apply(self, src):
+        """
+        Returns the action code for every source MAC in the uint64 array src.
+        """
+        result = np.full(len(src), self.default, dtype=np.uint8)
+        if len(self.keys):
+            i = np.minimum(np.searchsorted(self.keys, src), len(self.keys) - 1)
+            hit = self.keys[i] == src
+            result[hit] = self.actions[i[hit]]
+        return result
+
+
+def pack_macs(data, offsets):
+    """
+    Returns (dst, src) as uint64 arrays for the frames starting at offsets in
+    the uint8 array data.
+    """
+    raw = data[offsets[:, None] + np.arange(12)].astype(np.uint64)
+    dst = (raw[:, :6] << SHIFTS).sum(axis=1, dtype=np.uint64)
+    src = (raw[:, 6:] << SHIFTS).sum(axis=1, dtype=np.uint64)
+    return dst, src
+
+
+def rewrite(data, record_offsets, lengths, swap):
+    """
+    Gathers the given records (16-byte record header + frame) into one byte
+    array, swapping the MACs of the frames where swap is set.
+    """
+    sizes = 16 + lengths
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    index = np.repeat(record_offsets - starts, sizes) + np.arange(sizes.sum())
+    out = data[index]
+    at = starts[swap][:, None] + 16 + BYTES6
+    dst = out[at]
+    out[at] = out[at + 6]
+    out[at + 6] = dst
+    return out
+
+
+def replay(filename, table, output=None, ingress_port=0):
+    """
+    Runs every frame of a pcap through the model. Returns a dict of counts per
+    action, forwarded/dropped totals, the egress of each action and the processing rate.
+    """
+    counts = np.zeros(len(ACTION_NAMES), dtype=np.int64)
+    invalid = 0
+    started = time.perf_counter()
+    with PcapReader(filename) as reader:
+        data = np.frombuffer(reader.map, dtype=np.uint8)
+        _, offsets, incls, _ = reader.records()
+        offsets = np.frombuffer(offsets, dtype=np.uint64).astype(np.int64)
+        incls = np.frombuffer(incls, dtype=np.uint32).astype(np.int64)
+        out = open(output, "wb") if output else None
+        if out:
+            out.write(data[:24].tobytes())
+        for i in range(0, len(offsets), BATCH_SIZE):
+            off = offsets[i:i + BATCH_SIZE]
+            length = incls[i:i + BATCH_SIZE]
+            # hdr.ethernet.isValid(): the parser needs a whole Ethernet header
+            valid = length >= 14
+            invalid += int(np.count_nonzero(~valid))
+            off, length = off[valid], length[valid]
+            _, src = pack_macs(data, off)
+            action = table.apply(src)
+            counts += np.bincount(action, minlength=len(counts))
+            if out:
+                forward = action != DROP
+                block = rewrite(data, off[forward] - 16, length[forward], action[forward] == SWAP)
+                out.write(block.tobytes())
+        if out:
+            out.close()
+        del data
+    elapsed = time.perf_counter() - started
+    packets = int(counts.sum()) + invalid
+    return {
+        "packets": packets,
+        "forwarded": int(counts[SWAP] + counts[NO_ACTION]),
+        "dropped": int(counts[DROP]),
+        "not parsed": invalid,
+        "actions": {ACTION_NAMES[a]: int(c) for a, c in enumerate(counts)},
+        # swapped frames are reflected out of the ingress port; NoAction leaves egress_spec
+        # at its default of 0, so bmv2 sends the frame out of port 0
+        "egress": {ACTION_NAMES[SWAP]: f"port {ingress_port}", ACTION_NAMES[DROP]: "drop",
+                   ACTION_NAMES[NO_ACTION]: "port 0"},
+        "seconds": elapsed,
+        "packets/s": packets / elapsed if elapsed else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a pcap through a model of reflector.p4")
+    parser.add_argument("pcap")
+    parser.add_argument("--commands", help="simple_switch_CLI commands file with src_mac_drop entries")
+    parser.add_argument("-o", "--output", help="write the forwarded (rewritten) frames to this pcap")
+    parser.add_argument("--ingress-port", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.commands:
+        with open(args.commands) as f:
+            table = SrcMacTable.from_commands(f)
+    else:
+        table = SrcMacTable()
+    result = replay(args.pcap, table, args.output, args.ingress_port)
+    print(f"{result['packets']} packets: {result['forwarded']} forwarded, {result['dropped']} dropped, "
+          f"{result['not parsed']} without an Ethernet header")
+    for name, count in result["actions"].items():
+        print(f"  {name:20} {count:>10}  egress {result['egress'][name]}")
+    print(f"{result['seconds']:.3f} s, {result['packets/s']:.0f} packets/s")
+
+
+if __name__ == '__main__':
+    main()
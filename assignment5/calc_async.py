@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+"""
+Asynchronous prompt for the calc.p4 calculator.
+
+calc.py waits for the reply to each expression (up to 5 seconds) before it
+reads the next one. Here input is read while requests are in flight: every
+expression is sent as soon as it is entered and its result is printed when the
+reply arrives, tagged with the expression it answers:
+
+    > 1 + 2
+    > 7 ^ 3
+    [1 + 2] 3
+    [7 ^ 3] 4
+
+Every request has its own timeout, so a lost reply only affects its own
+expression. Replies are matched to requests by (op, operand_a, operand_b),
+which the switch sends back unchanged; requests with the same operands are
+answered in order. When stdin is a file or a pipe, expressions are sent as fast
+as they are read, with at most --window of them in flight, and the program
+exits once every reply has arrived or timed out.
+
+Usage:
+    sudo python3 calc_async.py
+    sudo python3 calc_async.py --iface enx0c37965f8a0f --timeout 2 --window 64 < expressions.txt
+    python3 calc_async.py --local              # answered by a model of calc.p4, no switch needed
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+from collections import Counter, defaultdict, deque
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from p4pkt import Ether, l2socket, bytes2mac
+from calc import P4calc, make_seq, num_parser, op_parser
+
+IFACE = "enx0c37965f8a0f"
+DST_MAC = "e4:5f:01:84:8c:5e"
+TIMEOUT = 5 # Seconds to wait for the reply to one expression
+WINDOW = 256 # Requests in flight at most
+
+# The operations of the calculate table in calc.p4; other ops are dropped
+OPERATIONS = {b"+": lambda a, b: a + b,
+              b"-": lambda a, b: a - b,
+              b"&": lambda a, b: a & b,
+              b"|": lambda a, b: a | b,
+              b"^": lambda a, b: a ^ b}
+
+
+def request_key(op, a, b):
+    """
+    What a reply has in common with its request (the operands wrap to 32 bits).
+    """
+    return op, a & 0xffffffff, b & 0xffffffff
+
+
+class CalcClient:
+    """
+    Sends P4calc requests on a socket and resolves the future of each request
+    when its reply arrives, from a reader callback on the event loop.
+    """
+
+    def __init__(self, sock, src=None):
+        self.loop = asyncio.get_running_loop()
+        self.sock = sock
+        self.src = src
+        self.pending = defaultdict(deque) # request key -> futures, oldest first
+        sock.setblocking(False)
+        self.loop.add_reader(sock.fileno(), self.receive)
+
+    def receive(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(65535)
+            except BlockingIOError:
+                return
+            if isinstance(address, tuple) and address[2] == socket.PACKET_OUTGOING:
+                continue # our own request
+            try:
+                p4calc = Ether(data)[P4calc]
+            except (IndexError, ValueError):
+                continue
+            waiting = self.pending.get(request_key(p4calc.op, p4calc.operand_a, p4calc.operand_b))
+            while waiting:
+                future = waiting.popleft()
+                if not future.done():
+                    future.set_result(p4calc.result)
+                    break
+
+    async def request(self, op, a, b, timeout=TIMEOUT):
+        """
+        Returns the result of `a op b`; raises asyncio.TimeoutError.
+        """
+        key = request_key(op.encode(), a, b)
+        future = self.loop.create_future()
+        self.pending[key].append(future)
+        pkt = Ether(dst=DST_MAC, src=self.src, type=0x1234) / P4calc(op=op, operand_a=a, operand_b=b) / ' '
+        self.sock.send(bytes(pkt))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if future in self.pending[key]:
+                self.pending[key].remove(future)
+            if not self.pending[key]:
+                del self.pending[key]
+
+
+class LocalCalc:
+    """
+    Model of calc.p4 on the other end of a socket pair, replying after a
+    random delay of up to `delay` seconds, so replies can come back out of order.
+    """
+
+    def __init__(self, sock, delay=0.0):
+        self.loop = asyncio.get_running_loop()
+        self.sock = sock
+        self.delay = delay
+        sock.setblocking(False)
+        self.loop.add_reader(sock.fileno(), self.receive)
+
+    def receive(self):
+        while True:
+            try:
+                frame = Ether(self.sock.recv(65535))
+            except BlockingIOError:
+                return
+            p4calc = frame[P4calc]
+            operation = OPERATIONS.get(p4calc.op)
+            if operation is None:
+                continue # operation_drop
+            p4calc.result = operation(p4calc.operand_a, p4calc.operand_b) & 0xffffffff # bit<32> arithmetic
+            frame.dst, frame.src = frame.src, frame.dst
+            self.loop.call_later(random.uniform(0, self.delay), self.sock.send, bytes(frame))
+
+
+def read_line(interactive):
+    try:
+        return input("> ") if interactive else (sys.stdin.readline() or None)
+    except EOFError:
+        return None
+
+
+async def evaluate(client, expression, tokens, timeout, window, counts):
+    started = time.perf_counter()
+    try:
+        result = await client.request(tokens[1].value, int(tokens[0].value), int(tokens[2].value), timeout)
+        print(f"[{expression}] {result}")
+        counts["answered"] += 1
+        counts["seconds"] += time.perf_counter() - started
+    except asyncio.TimeoutError:
+        print(f"[{expression}] Didn't receive response")
+        counts["timed out"] += 1
+    finally:
+        window.release()
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    if args.local:
+        sock, switch = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        LocalCalc(switch, args.local_delay)
+        client = CalcClient(sock)
+    else:
+        sock = l2socket(args.iface)
+        client = CalcClient(sock, bytes2mac(sock.getsockname()[4]))
+
+    parser = make_seq(num_parser, make_seq(op_parser, num_parser))
+    interactive = sys.stdin.isatty()
+    window = asyncio.Semaphore(args.window)
+    tasks = set()
+    counts = Counter()
+    started = time.perf_counter()
+    while True:
+        # the blocking read runs in a thread, so replies are handled (and printed) meanwhile
+        line = await loop.run_in_executor(None, read_line, interactive)
+        if line is None or line.strip() == "quit":
+            break
+        expression = line.strip()
+        if not expression:
+            continue
+        try:
+            _, tokens = parser(expression, 0, [])
+        except Exception as error:
+            print(f"[{expression}] {error}")
+            continue
+        await window.acquire()
+        task = asyncio.ensure_future(evaluate(client, expression, tokens, args.timeout, window, counts))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    if not interactive:
+        elapsed = time.perf_counter() - started
+        mean = counts["seconds"] / counts["answered"] * 1000 if counts["answered"] else float("nan")
+        print(f"{counts['answered']} answered, {counts['timed out']} timed out in {elapsed:.2f} s, "
+              f"mean round trip {mean:.1f} ms", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calculator prompt with many expressions in flight")
+    parser.add_argument("--iface", default=IFACE)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds to wait for each reply")
+    parser.add_argument("--window", type=int, default=WINDOW, help="requests in flight at most")
+    parser.add_argument("--local", action="store_true", help="send to a model of calc.p4 instead of the switch")
+    parser.add_argument("--local-delay", type=float, default=0.5, help="largest reply delay of the model, seconds")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+
+"""
+Control-plane client for simple_switch_CLI with diffed, batched table updates.
+
+`cwm cli` pipes commands.txt into a fresh simple_switch_CLI and sends every
+table_add one at a time, whether or not the entry is already installed.
+SwitchCLI instead keeps one CLI session open and pipelines batches of
+commands through it. sync() dumps the tables named in a commands file,
+compares them with the wanted entries and only sends the table_add,
+table_modify and table_delete commands needed to get from one to the other.
+A table_set_default is only sent when the dumped default action differs.
+Other commands (register_write, mirroring_add, ...) cannot be compared with the
+switch state and are sent on every sync, so reloading an unchanged file sends
+only those.
+
+Usage:
+    python3 controlplane.py commands.txt
+    python3 controlplane.py --dry-run commands.txt
+    python3 controlplane.py --cli "python3 fake_switch_cli.py --state /tmp/switch.json" commands.txt
+"""
+
+import argparse
+import re
+import shlex
+import subprocess
+import sys
+import threading
+from collections import namedtuple
+
+PROMPT = b"RuntimeCmd: "
+BATCH_SIZE = 512 # Commands written to the CLI before reading their output
+
+Entry = namedtuple("Entry", ["table", "key", "action", "params", "tokens"], defaults=[None])
+Lpm = namedtuple("Lpm", ["value", "prefix"])
+Ternary = namedtuple("Ternary", ["value", "mask"])
+Entry.__doc__ = """
+One table entry. key and params are tuples of normalized values (see value())
+so entries read from a commands file and from table_dump compare equal.
+tokens keeps the (key, params) strings as written in a commands file, so the
+commands sent to the switch read like the file.
+"""
+
+
+class CLIError(Exception):
+    pass
+
+
+def value(token, hex_only=False):
+    """
+    Normalizes a match or parameter value to an int, an Lpm for "value/prefix"
+    or a Ternary for "value&&&mask". CLI tokens may be IPv4 addresses, MAC
+    addresses or decimal/0x numbers; table_dump prints bare hex digits.
+    """
+    if "/" in token:
+        addr, prefix = token.split("/")
+        prefix = int(prefix)
+        width = field_width(addr, hex_only)
+        v = value(addr, hex_only)
+        if width:
+            # the switch stores the address with the host bits cleared
+            v &= ~((1 << (width - prefix)) - 1)
+        return Lpm(v, prefix)
+    if "&&&" in token:
+        v, mask = token.split("&&&")
+        mask = value(mask.strip(), hex_only)
+        return Ternary(value(v.strip(), hex_only) & mask, mask)
+    if hex_only:
+        return int(token, 16)
+    if token.count(".") == 3:
+        a, b, c, d = (int(x) for x in token.split("."))
+        return (a << 24) | (b << 16) | (c << 8) | d
+    if token.count(":") == 5:
+        return int(token.replace(":", ""), 16)
+    return int(token, 0)
+
+
+def field_width(token, hex_only=False):
+    """
+    Bit width of a value when the token tells it (IPv4, MAC, dumped hex), else None.
+    """
+    if hex_only:
+        return 4 * len(token)
+    if token.count(".") == 3:
+        return 32
+    if token.count(":") == 5:
+        return 48
+    return None
+
+
+def parse_table_add(line):
+    """
+    Returns the Entry of a "table_add <table> <action> <key...> => <params...>" line.
+    """
+    left, arrow, right = line.partition("=>")
+    args = left.split()
+    if args[0] != "table_add" or len(args) < 3 or not arrow:
+        raise ValueError(f"not a table_add command: {line}")
+    params = right.split()
+    return Entry(args[1], tuple(value(k) for k in args[3:]), args[2],
+                 tuple(value(p) for p in params), (args[3:], params))
+
+
+def read_commands(lines):
+    """
+    Splits a commands file into its table entries, keyed by (table, key), and
+    the other commands (table_set_default, ...), which are sent as they are.
+    Later entries with the same key replace earlier ones.
+    """
+    entries = {}
+    others = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("table_add "):
+            entry = parse_table_add(line)
+            entries[entry.table, entry.key] = entry
+        else:
+            others.append(line)
+    return entries, others
+
+
+def parse_default(output):
+    """
+    Returns the (action, params) of the default entry in the output of
+    "table_dump <table>", or None if the table has no default entry.
+    """
+    lines = iter(output.splitlines())
+    for line in lines:
+        if line.strip() == "Dumping default entry":
+            for line in lines:
+                line = line.strip()
+                if line.startswith("Action entry:"):
+                    action, _, params = line[len("Action entry:"):].partition(" -")
+                    return action.strip(), tuple(value(p.strip(), hex_only=True) for p in params.split(",") if p.strip())
+                if line.startswith("="):
+                    break
+    return None
+
+
+def set_default(line):
+    """
+    Returns (table, (action, params)) of a "table_set_default <table> <action> <params...>" line.
+    """
+    args = line.split()
+    if len(args) < 3:
+        raise ValueError(f"not a table_set_default command: {line}")
+    return args[1], (args[2], tuple(value(p) for p in args[3:]))
+
+
+def parse_dump(table, output):
+    """
+    Parses the output of "table_dump <table>" into {(table, key): (handle, Entry)}.
+    """
+    installed = {}
+    handle = None
+    key = []
+    for line in output.splitlines():
+        line = line.strip()
+        match = re.match(r"Dumping entry (0x[0-9a-fA-F]+)", line)
+        if match:
+            handle = int(match.group(1), 16)
+            key = []
+        elif line.startswith("* ") and handle is not None:
+            # "* hdr.ipv4.dstAddr    : LPM       a9fe15de/32"
+            kind_value = line.split(":", 1)[1].split(None, 1)
+            key.append(value(kind_value[1].replace(" ", ""), hex_only=True))
+        elif line.startswith("Action entry:") and handle is not None:
+            action, _, params = line[len("Action entry:"):].partition(" -")
+            params = tuple(value(p.strip(), hex_only=True) for p in params.split(",") if p.strip())
+            entry = Entry(table, tuple(key), action.strip(), params)
+            installed[table, entry.key] = (handle, entry)
+            handle = None
+    return installed
+
+
+def diff(wanted, installed):
+    """
+    Returns the (adds, modifies, deletes) that turn the installed entries into
+    the wanted ones: adds are Entries, modifies are (handle, Entry) with the new
+    action and parameters, deletes are (handle, Entry) of entries to remove.
+    """
+    adds = []
+    modifies = []
+    deletes = []
+    for k, entry in wanted.items():
+        current = installed.get(k)
+        if current is None:
+            adds.append(entry)
+        elif (current[1].action, current[1].params) != (entry.action, entry.params):
+            modifies.append((current[0], entry))
+    for k, current in installed.items():
+        if k not in wanted:
+            deletes.append(current)
+    return adds, modifies, deletes
+
+
+def fmt(v):
+    if isinstance(v, Lpm):
+        return f"{v.value}/{v.prefix}"
+    if isinstance(v, Ternary):
+        return f"{v.value}&&&{v.mask}"
+    return str(v)
+
+
+def tokens(entry):
+    if entry.tokens is not None:
+        return entry.tokens
+    return [fmt(k) for k in entry.key], [fmt(p) for p in entry.params]
+
+
+def add_command(entry):
+    key, params = tokens(entry)
+    return f"table_add {entry.table} {entry.action} {' '.join(key)} => {' '.join(params)}"
+
+
+def modify_command(handle, entry):
+    return f"table_modify {entry.table} {entry.action} {handle} {' '.join(tokens(entry)[1])}"
+
+
+def delete_command(handle, entry):
+    return f"table_delete {entry.table} {handle}"
+
+
+class SwitchCLI:
+    """
+    A persistent simple_switch_CLI session. run() pipelines commands and
+    returns the output of each one, split on the CLI prompt.
+    """
+
+    def __init__(self, command="simple_switch_CLI"):
+        if isinstance(command, str):
+            command = shlex.split(command)
+        try:
+            self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.STDOUT, bufsize=0)
+        except OSError as error:
+            raise CLIError(f"cannot start {command[0]}: {error}")
+        self.buffer = b""
+        self.banner = self._read_prompts(1)[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_prompts(self, n):
+        """
+        Reads until n more prompts have been printed and returns the output
+        before each of them.
+        """
+        outputs = []
+        while len(outputs) < n:
+            i = self.buffer.find(PROMPT)
+            if i >= 0:
+                outputs.append(self.buffer[:i].decode(errors="replace"))
+                self.buffer = self.buffer[i + len(PROMPT):]
+                continue
+            data = self.proc.stdout.read(65536)
+            if not data:
+                raise CLIError(f"CLI exited: {self.buffer.decode(errors='replace').strip()}")
+            self.buffer += data
+        return outputs
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[self.proc.stdin.write(view):]
+
+    def run(self, commands, check=True):
+        """
+        Sends commands in batches of BATCH_SIZE and returns their outputs.
+        With check, a CLIError is raised if any command reports an error.
+        """
+        outputs = []
+        for i in range(0, len(commands), BATCH_SIZE):
+            batch = commands[i:i + BATCH_SIZE]
+            data = "".join(c + "\n" for c in batch).encode()
+            # write from another thread, so a full stdout pipe cannot deadlock us
+            writer = threading.Thread(target=self._write, args=(data,))
+            writer.start()
+            outputs += self._read_prompts(len(batch))
+            writer.join()
+        if check:
+            for command, output in zip(commands, outputs):
+                if re.search(r"^(Error|Invalid|\*\*\* Unknown)", output, re.MULTILINE):
+                    raise CLIError(f"{command}: {output.strip()}")
+        return outputs
+
+    def dump(self, table):
+        return parse_dump(table, self.run([f"table_dump {table}"])[0])
+
+    def close(self):
+        if self.proc.poll() is None:
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            self.proc.wait()
+
+
+def plan(cli, wanted, tables=None, others=()):
+    """
+    Returns the commands that bring the tables in `tables` (by default, the
+    tables of the wanted entries and of the table_set_default lines in
+    `others`) to the wanted state. Deletes come first so that a freed key can
+    be added again in the same sync. The `others` follow, without the
+    table_set_default lines whose default action is already installed.
+    """
+    defaults = dict(set_default(line) for line in others if line.split()[0] == "table_set_default")
+    if tables is None:
+        tables = sorted({table for table, _ in wanted} | set(defaults))
+    installed = {}
+    current = {}
+    for table in tables:
+        output = cli.run([f"table_dump {table}"])[0]
+        installed.update(parse_dump(table, output))
+        current[table] = parse_default(output)
+    adds, modifies, deletes = diff(wanted, installed)
+    commands = [delete_command(h, e) for h, e in deletes]
+    commands += [modify_command(h, e) for h, e in modifies]
+    commands += [add_command(e) for e in adds]
+    for line in others:
+        if line.split()[0] == "table_set_default":
+            table, default = set_default(line)
+            if table in current and current[table] == default and defaults[table] == default:
+                continue
+        commands.append(line)
+    return commands, (len(adds), len(modifies), len(deletes))
+
+
+def sync(cli, lines, dry_run=False):
+    """
+    Applies a commands file incrementally. Returns the commands that were
+    (or with dry_run, would be) sent and the (adds, modifies, deletes) counts.
+    """
+    wanted, others = read_commands(lines)
+    commands, counts = plan(cli, wanted, others=others)
+    if not dry_run:
+        cli.run(commands)
+    return commands, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally apply a simple_switch_CLI commands file")
+    parser.add_argument("commands", help="commands file, e.g. commands.txt")
+    parser.add_argument("--cli", default="simple_switch_CLI", help="CLI command line, e.g. 'simple_switch_CLI --thrift-port 9090'")
+    parser.add_argument("--dry-run", action="store_true", help="print the commands instead of sending them")
+    args = parser.parse_args()
+
+    with open(args.commands) as f:
+        lines = f.readlines()
+    try:
+        with SwitchCLI(args.cli) as cli:
+            commands, (adds, modifies, deletes) = sync(cli, lines, args.dry_run)
+    except CLIError as error:
+        print(error)
+        sys.exit(1)
+    if args.dry_run:
+        for command in commands:
+            print(command)
+    print(f"{adds} added, {modifies} modified, {deletes} deleted")
+
+
+if __name__ == '__main__':
+    main()
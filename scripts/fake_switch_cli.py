@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+"""
+Local stand-in for simple_switch_CLI, for testing control-plane scripts
+without a running switch.
+
+It speaks the same line protocol as the real CLI on stdin/stdout (the
+'RuntimeCmd: ' prompt and the output of table_add, table_modify, table_delete,
+table_dump, table_clear and table_set_default), but it does not know the P4
+program: any table and action name is accepted and match keys/parameters are
+stored as given. With --state, the tables are saved to a JSON file when the session ends and
+loaded by the next one, like a switch that keeps running while the CLI is restarted.
+
+Usage:
+    python3 fake_switch_cli.py < commands.txt
+    python3 controlplane.py --cli "python3 fake_switch_cli.py --state /tmp/switch.json" commands.txt
+"""
+
+import argparse
+import cmd
+import json
+import os
+
+PROMPT = "RuntimeCmd: "
+
+
+def to_hex(token):
+    """
+    Formats a CLI value the way table_dump prints it: hex digits, without
+    separators, padded to whole bytes.
+    """
+    if token.count(".") == 3:
+        return "".join(f"{int(b):02x}" for b in token.split("."))
+    if token.count(":") == 5:
+        return token.replace(":", "").lower()
+    value = int(token, 0)
+    digits = f"{value:x}"
+    return digits.zfill(len(digits) + len(digits) % 2)
+
+
+def match_str(token):
+    if "/" in token:
+        value, prefix = token.split("/")
+        return "LPM", f"{to_hex(value)}/{prefix}"
+    if "&&&" in token:
+        value, mask = token.split("&&&")
+        return "TERNARY", f"{to_hex(value)} &&& {to_hex(mask)}"
+    return "EXACT", to_hex(token)
+
+
+class FakeSwitch(cmd.Cmd):
+    prompt = PROMPT
+    intro = "Obtaining JSON from switch...\nDone\nControl utility for runtime P4 table manipulation"
+
+    def __init__(self, state=None):
+        super().__init__()
+        self.state = state
+        self.tables = {}
+        self.defaults = {}
+        self.next_handle = {}
+        if state and os.path.exists(state):
+            with open(state) as f:
+                saved = json.load(f)
+            self.tables = {t: {int(h): e for h, e in entries.items()} for t, entries in saved["tables"].items()}
+            self.defaults = saved["defaults"]
+            self.next_handle = saved["next_handle"]
+        # match key -> handle of every table, to find duplicates quickly
+        self.keys = {t: {tuple(e["key"]): h for h, e in entries.items()} for t, entries in self.tables.items()}
+
+    def postloop(self):
+        self.save()
+
+    def save(self):
+        if self.state:
+            with open(self.state, "w") as f:
+                json.dump({"tables": self.tables, "defaults": self.defaults,
+                           "next_handle": self.next_handle}, f)
+
+    def emptyline(self):
+        pass
+
+    def default(self, line):
+        print(f"*** Unknown syntax: {line}")
+
+    def do_EOF(self, line):
+        return True
+
+    def do_table_add(self, line):
+        "table_add <table name> <action name> <match fields> => <action parameters>"
+        left, arrow, right = line.partition("=>")
+        args = left.split()
+        if len(args) < 2 or not arrow:
+            print("Error: Invalid table_add syntax")
+            return
+        table, action, key = args[0], args[1], args[2:]
+        params = right.split()
+        entries = self.tables.setdefault(table, {})
+        keys = self.keys.setdefault(table, {})
+        if tuple(key) in keys:
+            print("Invalid table operation (DUPLICATE_ENTRY)")
+            return
+        handle = self.next_handle.get(table, 0)
+        self.next_handle[table] = handle + 1
+        entries[handle] = {"key": key, "action": action, "params": params}
+        keys[tuple(key)] = handle
+        kind = match_str(key[0])[0].lower() if key else "exact"
+        print(f"Adding entry to {kind} match table {table}")
+        print(f"match key:           {' '.join(match_str(k)[1] for k in key)}")
+        print(f"action:              {action}")
+        print(f"runtime data:        {' '.join(to_hex(p) for p in params)}")
+        print(f"Entry has been added with handle {handle}")
+
+    def do_table_modify(self, line):
+        "table_modify <table name> <action name> <entry handle> [action parameters]"
+        args = line.split()
+        if len(args) < 3:
+            print("Error: Invalid table_modify syntax")
+            return
+        table, action, handle = args[0], args[1], int(args[2], 0)
+        entry = self.tables.get(table, {}).get(handle)
+        if entry is None:
+            print("Invalid table operation (INVALID_HANDLE)")
+            return
+        entry["action"] = action
+        entry["params"] = [p for p in args[3:] if p != "=>"]
+        print(f"Modifying entry {handle} for match table {table}")
+
+    def do_table_delete(self, line):
+        "table_delete <table name> <entry handle>"
+        args = line.split()
+        if len(args) != 2:
+            print("Error: Invalid table_delete syntax")
+            return
+        table, handle = args[0], int(args[1], 0)
+        entry = self.tables.get(table, {}).pop(handle, None)
+        if entry is None:
+            print("Invalid table operation (INVALID_HANDLE)")
+            return
+        del self.keys[table][tuple(entry["key"])]
+        print(f"Deleting entry {handle} from {table}")
+
+    def do_table_clear(self, line):
+        "table_clear <table name>"
+        self.tables.pop(line.strip(), None)
+        self.keys.pop(line.strip(), None)
+
+    def do_table_set_default(self, line):
+        "table_set_default <table name> <action name> <action parameters>"
+        args = line.split()
+        if len(args) < 2:
+            print("Error: Invalid table_set_default syntax")
+            return
+        self.defaults[args[0]] = {"action": args[1], "params": args[2:]}
+        print(f"Setting default action of {args[0]}")
+        print(f"action:              {args[1]}")
+        print(f"runtime data:        {' '.join(to_hex(p) for p in args[2:])}")
+
+    def do_table_dump(self, line):
+        "table_dump <table name>"
+        table = line.strip()
+        print("==========")
+        print("TABLE ENTRIES")
+        for handle, entry in sorted(self.tables.get(table, {}).items()):
+            print("**********")
+            print(f"Dumping entry {handle:#x}")
+            print("Match key:")
+            for i, k in enumerate(entry["key"]):
+                kind, value = match_str(k)
+                print(f"* field_{i:<14}: {kind:10}{value}")
+            print(f"Action entry: {entry['action']} - {', '.join(to_hex(p) for p in entry['params'])}")
+        print("==========")
+        print("Dumping default entry")
+        default = self.defaults.get(table)
+        if default:
+            print(f"Action entry: {default['action']} - {', '.join(to_hex(p) for p in default['params'])}")
+        else:
+            print("EMPTY")
+        print("==========")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in for simple_switch_CLI")
+    parser.add_argument("--state", help="JSON file to keep the tables in between runs")
+    parser.add_argument("--thrift-port", help="ignored, accepted for compatibility")
+    args = parser.parse_args()
+    FakeSwitch(args.state).cmdloop()
+
+
+if __name__ == '__main__':
+    main()
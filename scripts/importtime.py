@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Import-time budget of the client entry points.
+
+Runs every entry point's imports in a fresh interpreter with
+`python3 -X importtime` (the module is loaded without running main()), adds up
+the cumulative time of the top-level imports, and checks it against a budget.
+Exits with 1 if an entry point is over budget, e.g. because a
+`from scapy.all import *` came back, and lists its slowest imports.
+
+Usage:
+    python3 importtime.py
+    python3 importtime.py --budget 100 --repeat 5 --top 5
+    python3 importtime.py ../MiniProject/v8/traffic.py
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ENTRY_POINTS = ["assignment1/send.py", "assignment4/send.py", "assignment5/calc.py"] + \
+               [f"MiniProject/v{v}/traffic.py" for v in range(1, 9)]
+BUDGET_MS = 100 # Import time allowed per entry point
+REPEAT = 3 # Runs per entry point, the fastest one is kept
+
+MARKER = "-- entry point --\n" # written by the loader, the imports of the entry point follow it
+LOADER = ("import importlib.util, sys; path = sys.argv[1]; "
+          "spec = importlib.util.spec_from_file_location('__entry__', path); "
+          f"sys.stderr.write({MARKER!r}); sys.stderr.flush(); "
+          "spec.loader.exec_module(importlib.util.module_from_spec(spec))")
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(path):
+    """
+    Imports one entry point in a new interpreter. Returns (total ms,
+    [(cumulative ms, module)] of its direct imports).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", LOADER, path],
+                            capture_output=True, text=True, cwd=os.path.dirname(path))
+    if result.returncode:
+        raise RuntimeError(f"{path}: {result.stderr.strip().splitlines()[-1]}")
+    imports = []
+    for line in result.stderr.split(MARKER, 1)[1].splitlines():
+        match = LINE.match(line)
+        # one space of indentation: imported by the entry point itself
+        if match and len(match.group(3)) == 1:
+            imports.append((int(match.group(2)) / 1000, match.group(4)))
+    return sum(ms for ms, _ in imports), imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the client scripts against a budget")
+    parser.add_argument("paths", nargs="*", help="entry points (default: calc.py, every traffic.py and send.py)")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help="milliseconds allowed per entry point")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--top", type=int, default=3, help="slowest imports to list for an entry point over budget")
+    args = parser.parse_args()
+
+    paths = [os.path.abspath(p) for p in args.paths] or [os.path.normpath(os.path.join(ROOT, p)) for p in ENTRY_POINTS]
+    over = 0
+    print(f"{'entry point':40}{'import ms':>10}")
+    for path in paths:
+        total, imports = min((measure(path) for _ in range(args.repeat)), key=lambda run: run[0])
+        name = os.path.relpath(path, ROOT)
+        status = "" if total <= args.budget else f"  over budget ({args.budget:.0f} ms)"
+        print(f"{name:40}{total:>10.1f}{status}")
+        if status:
+            over += 1
+            for ms, module in sorted(imports, reverse=True)[:args.top]:
+                print(f"    {module:36}{ms:>10.1f}")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+"""
+Batch decoder of captures of the custom 0x1234 protocols into NumPy arrays.
+
+The layouts are not written down a second time: the registry loads the header
+classes of the clients (P4calc in assignment5/calc.py, P4Traffic in every
+MiniProject/v*/traffic.py) and turns each fields_desc into a NumPy structured
+dtype of Ethernet + header, so
+
+    calc, v1 ... v6, v7, v7-16, v7-32, v8
+
+each map to a dtype of the same size as the frames on the wire. A capture is
+decoded with one np.frombuffer over the memory-mapped pcap (see pcapstream.py):
+the frames with ethertype 0x1234, the 'P4' magic, the layout's version byte and
+enough bytes are selected with boolean masks, gathered in one indexing
+operation and viewed as the structured dtype. BitFields (v8's Op and Arrivals)
+are split into fields of their own.
+
+v1 to v6 and calc all send version 0x01, so pick the layout of the client that
+made the capture; the default is the layouts of v7 and v8, which have one
+version byte each.
+
+Usage:
+    python3 p4decode.py --list
+    python3 p4decode.py capture.pcap
+    python3 p4decode.py --layout calc --head 10 capture.pcap
+    python3 p4decode.py --layout v6 -o decoded.npz capture.pcap
+"""
+
+import argparse
+import importlib.util
+import os
+import re
+import time
+
+import numpy as np
+
+import p4pkt
+from p4pkt import Packet, BitField, StrFixedLenField, ShortField, IntField, P4_ETYPE, P4_MAGIC
+from pcapstream import PcapReader
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLIENTS = {"calc": "assignment5/calc.py", **{f"v{v}": f"MiniProject/v{v}/traffic.py" for v in range(1, 9)}}
+DEFAULT_LAYOUTS = ["v7", "v7-16", "v7-32", "v8"]
+
+ETHERNET = [("dst", "S6"), ("src", "S6"), ("type", ">u2")]
+ETHERNET_SIZE = 14
+BITS_DTYPES = {8: "u1", 16: ">u2", 32: ">u4"}
+
+_layouts = {}
+
+
+class Layout:
+    """
+    One header class as NumPy dtypes: `wire` is Ethernet + header exactly as
+    sent (bit fields grouped into whole bytes), `dtype` the decoded rows, with
+    native byte order, bit fields split and the frame index and time in front.
+    """
+
+    def __init__(self, name, cls):
+        self.name = name
+        self.cls = cls
+        self.version = cls().version
+        self.size = ETHERNET_SIZE + cls.size()
+        wire = list(ETHERNET)
+        self.bitfields = [] # (wire field, [(name, shift, mask)])
+        group, bits = [], 0
+        for field in cls.fields_desc:
+            if isinstance(field, BitField):
+                group.append(field)
+                bits += field.bits
+                if bits % 8:
+                    continue
+                name = "_".join(f.name for f in group)
+                wire.append((name, BITS_DTYPES[bits]))
+                shift, parts = bits, []
+                for f in group:
+                    shift -= f.bits
+                    parts.append((f.name, shift, (1 << f.bits) - 1))
+                self.bitfields.append((name, parts))
+                group, bits = [], 0
+            elif isinstance(field, StrFixedLenField):
+                wire.append((field.name, f"S{field.bits // 8}"))
+            elif isinstance(field, IntField):
+                wire.append((field.name, ">u4"))
+            elif isinstance(field, ShortField):
+                wire.append((field.name, ">u2"))
+            else:
+                wire.append((field.name, "u1"))
+        self.wire = np.dtype(wire)
+        fields = [("frame", "i8"), ("time", "f8")]
+        split = dict(self.bitfields)
+        for name, (dtype, _) in self.wire.fields.items():
+            if name in split:
+                fields += [(part, "u1") for part, _, _ in split[name]]
+            else:
+                fields.append((name, dtype.newbyteorder("=")))
+        self.dtype = np.dtype(fields)
+
+    def __repr__(self):
+        return f"<Layout {self.name} version 0x{self.version:02x}, {self.size} bytes>"
+
+    def unpack(self, rows, frames, times):
+        """
+        Converts an array of wire rows to the decoded dtype.
+        """
+        out = np.empty(len(rows), dtype=self.dtype)
+        out["frame"] = frames
+        out["time"] = times
+        split = dict(self.bitfields)
+        for name in self.wire.names:
+            if name in split:
+                for part, shift, mask in split[name]:
+                    out[part] = (rows[name] >> shift) & mask
+            else:
+                out[name] = rows[name]
+        return out
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(f"p4layout_{name.replace('-', '_')}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def layouts():
+    """
+    The registry: {layout name: Layout} of every client header class. A client
+    with several layouts (v7's P4Traffic16 and P4Traffic32) gets one entry
+    per class, suffixed with its counter width.
+    Loading a client runs its bind_layers(Ether, ..., type=0x1234), so the
+    0x1234 binding of the caller is put back afterwards.
+    """
+    if not _layouts:
+        saved = dict(p4pkt._bindings)
+        try:
+            for name, path in CLIENTS.items():
+                module = _load(name, os.path.join(ROOT, path))
+                for cls in vars(module).values():
+                    if isinstance(cls, type) and issubclass(cls, Packet) and cls.__module__ == module.__name__:
+                        width = re.search(r"(\d+)$", cls.__name__)
+                        key = f"{name}-{width.group(1)}" if width else name
+                        _layouts[key] = Layout(key, cls)
+        finally:
+            p4pkt._bindings.clear()
+            p4pkt._bindings.update(saved)
+    return _layouts
+
+
+def decode(data, offsets, lengths, layout, times=None):
+    """
+    Decodes the frames starting at `offsets` (with captured `lengths`) in the
+    uint8 array `data` that are of `layout`. Returns its structured array.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    frames = np.arange(len(offsets))
+    # first the length, so that the header bytes read below exist
+    keep = lengths >= layout.size
+    frames, offsets = frames[keep], offsets[keep]
+    header = data[offsets[:, None] + np.arange(ETHERNET_SIZE - 2, ETHERNET_SIZE + 3)]
+    keep = ((header[:, 0] == P4_ETYPE >> 8) & (header[:, 1] == P4_ETYPE & 0xff) &
+            (header[:, 2] == P4_MAGIC[0]) & (header[:, 3] == P4_MAGIC[1]) & (header[:, 4] == layout.version))
+    frames, offsets = frames[keep], offsets[keep]
+    rows = data[offsets[:, None] + np.arange(layout.size)].view(layout.wire).ravel()
+    times = np.asarray(times)[frames] if times is not None else np.zeros(len(frames))
+    return layout.unpack(rows, frames, times)
+
+
+def decode_pcap(filename, names=DEFAULT_LAYOUTS):
+    """
+    Decodes a capture into {layout name: structured array}.
+    """
+    registry = layouts()
+    with PcapReader(filename) as reader:
+        data = np.frombuffer(reader.map, dtype=np.uint8)
+        ts, offsets, incls, _ = reader.records()
+        offsets = np.frombuffer(offsets, dtype=np.uint64).astype(np.int64)
+        incls = np.frombuffer(incls, dtype=np.uint32)
+        ts = np.frombuffer(ts, dtype=np.float64)
+        decoded = {name: decode(data, offsets, incls, registry[name], ts) for name in names}
+        del data
+    return decoded, len(offsets)
+
+
+def show(row, field):
+    if field in ("dst", "src"):
+        return row[field].ljust(6, b"\0").hex(":") # S6 drops trailing zero bytes
+    return row[field]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode the 0x1234 frames of a capture into NumPy arrays")
+    parser.add_argument("pcap", nargs="?")
+    parser.add_argument("--layout", nargs="+", default=DEFAULT_LAYOUTS, help="layouts to decode (see --list)")
+    parser.add_argument("--list", action="store_true", help="list the layouts and their dtypes")
+    parser.add_argument("--head", type=int, default=0, help="print the first N rows of each layout")
+    parser.add_argument("-o", "--output", help="save the arrays to this .npz file, one per layout")
+    args = parser.parse_args()
+
+    if args.list:
+        for layout in layouts().values():
+            print(f"{layout.name:8} version 0x{layout.version:02x} {layout.size:3} bytes  {CLIENTS[layout.name.split('-')[0]]}")
+            print(f"         {', '.join(layout.dtype.names[2:])}")
+        return
+    if not args.pcap:
+        parser.error("a pcap is needed (or --list)")
+    unknown = set(args.layout) - set(layouts())
+    if unknown:
+        parser.error(f"unknown layout {', '.join(sorted(unknown))} (see --list)")
+
+    started = time.perf_counter()
+    decoded, frames = decode_pcap(args.pcap, args.layout)
+    elapsed = time.perf_counter() - started
+    print(f"{frames} frames in {elapsed:.3f} s ({frames / elapsed if elapsed else float('inf'):.0f} frames/s)")
+    for name, rows in decoded.items():
+        print(f"  {name:8} {len(rows)}")
+        for row in rows[:args.head]:
+            print("    " + " ".join(f"{field}={show(row, field)}" for field in rows.dtype.names))
+    if args.output:
+        np.savez(args.output, **{name.replace("-", "_"): rows for name, rows in decoded.items()})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+
+"""
+Minimal packet codec for the clients (calc.py, traffic.py, send.py).
+
+`from scapy.all import *` takes most of a second before the first packet is
+sent, because it loads every layer, route and interface scapy knows about. The
+clients only need Ethernet, the 0x1234 custom headers (P4calc, P4Traffic) and,
+for send.py, plain IPv4/TCP/UDP, so this module provides just that subset with
+the same names, field types and `/` stacking as scapy:
+
+    Ether, IP, TCP, UDP, Raw, Packet, bind_layers, raw,
+    StrFixedLenField, ByteField, XByteField, ShortField, IntField, BitField,
+    srp1, sendp, get_if_list, get_if_hwaddr
+
+so a client switches over by replacing its scapy import with
+`from p4pkt import *`. Frames are built with struct and sent on an AF_PACKET
+socket (root is needed, as with scapy). scapy is only imported, lazily, by
+show() and to_scapy(), for debugging.
+
+Usage:
+    python3 p4pkt.py              # encode and decode a P4calc frame
+    python3 p4pkt.py --show       # the same, printed with scapy's show()
+"""
+
+import argparse
+import copy
+import os
+import socket
+import struct
+import time
+
+__all__ = ["Ether", "IP", "TCP", "UDP", "Raw", "Packet", "bind_layers", "raw",
+           "StrFixedLenField", "ByteField", "XByteField", "ShortField", "IntField", "BitField",
+           "srp1", "sendp", "get_if_list", "get_if_hwaddr"]
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+P4_ETYPE = 0x1234 # Ethertype of the custom protocols (P4calc, P4Traffic)
+P4_MAGIC = b"P4"
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+ZERO_MAC = "00:00:00:00:00:00"
+
+ETHERNET = struct.Struct("!6s6sH")
+IPV4 = struct.Struct("!BBHHHBBH4s4s")
+TCP_HEADER = struct.Struct("!HHIIBBHHH")
+UDP_HEADER = struct.Struct("!HHHH")
+PSEUDO = struct.Struct("!4s4sBBH")
+
+_bindings = {} # ethertype -> Packet class, filled by bind_layers()
+_sockets = {} # iface -> socket, kept open by sendp() and srp1()
+_scapy_classes = {} # Packet class -> scapy class, for show()
+
+
+def mac2bytes(mac):
+    return bytes.fromhex(mac.replace(":", ""))
+
+
+def bytes2mac(data):
+    return ":".join(f"{b:02x}" for b in data)
+
+
+def checksum(data):
+    """
+    Internet checksum (RFC 1071).
+    """
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+class Layer:
+    """
+    One header of a frame. Layers are stacked with `/` like in scapy:
+    a / b returns a copy of a with b appended after its last layer, so a
+    header template (e.g. an Ether) can be reused in a loop.
+    """
+    name = "Layer"
+    payload = None
+
+    def __truediv__(self, other):
+        if isinstance(other, (str, bytes)):
+            other = Raw(other)
+        top = node = copy.copy(self)
+        while node.payload is not None:
+            node.payload = copy.copy(node.payload)
+            node = node.payload
+        node.payload = other
+        return top
+
+    def __bytes__(self):
+        return self.build()
+
+    def __len__(self):
+        return len(bytes(self))
+
+    def __getitem__(self, cls):
+        layer = self
+        while layer is not None:
+            if isinstance(layer, cls):
+                return layer
+            layer = layer.payload
+        raise IndexError(f"Layer [{cls.name}] not found")
+
+    def build(self, under=None):
+        """
+        Returns the bytes of this layer and the ones after it. `under` is the
+        layer before, for the TCP/UDP pseudo-header checksum.
+        """
+        payload = self.payload.build(self) if self.payload is not None else b""
+        return self.header(payload, under) + payload
+
+    def header(self, payload, under):
+        raise NotImplementedError
+
+    def fields(self):
+        return {}
+
+    def summary(self):
+        return " / ".join(f"{layer.name}" for layer in self.layers())
+
+    def layers(self):
+        layer = self
+        while layer is not None:
+            yield layer
+            layer = layer.payload
+
+    def to_scapy(self):
+        """
+        The same frame as a scapy packet, for debugging. Imports scapy.
+        """
+        from scapy.layers.l2 import Ether as ScapyEther
+        from scapy.packet import Raw as ScapyRaw
+        data = bytes(self)
+        if isinstance(self, Packet):
+            return _scapy_class(type(self))(data)
+        if isinstance(self, Ether) and isinstance(self.payload, Packet):
+            return ScapyEther(data[:ETHERNET.size]) / self.payload.to_scapy()
+        return ScapyEther(data) if isinstance(self, Ether) else ScapyRaw(data)
+
+    def show(self):
+        self.to_scapy().show()
+
+
+class Raw(Layer):
+    name = "Raw"
+
+    def __init__(self, load=b""):
+        self.load = load.encode() if isinstance(load, str) else bytes(load)
+
+    def header(self, payload, under):
+        return self.load
+
+    def fields(self):
+        return {"load": self.load}
+
+
+class Ether(Layer):
+    """
+    Ethernet header. Ether(data) decodes a frame: the payload becomes the
+    header class bound to its ethertype (see bind_layers), or Raw.
+    """
+    name = "Ethernet"
+
+    def __init__(self, _pkt=None, dst="ff:ff:ff:ff:ff:ff", src=None, type=None):
+        self.dst = dst
+        self.src = src # None: the MAC of the interface it is sent from
+        self.type = type
+        if _pkt is not None:
+            self.decode(bytes(_pkt))
+
+    def decode(self, data):
+        dst, src, self.type = ETHERNET.unpack_from(data)
+        self.dst = bytes2mac(dst)
+        self.src = bytes2mac(src)
+        cls = _bindings.get(self.type)
+        rest = data[ETHERNET.size:]
+        if cls is not None and len(rest) >= cls.size():
+            self.payload = cls.dispatch_hook(rest)().decode(rest)
+        elif rest:
+            self.payload = Raw(rest)
+
+    def header(self, payload, under):
+        etype = self.type
+        if etype is None:
+            etype = ETH_P_IP if isinstance(self.payload, IP) else 0x9000
+            for ethertype, cls in _bindings.items():
+                if isinstance(self.payload, cls):
+                    etype = ethertype
+        return ETHERNET.pack(mac2bytes(self.dst), mac2bytes(self.src or ZERO_MAC), etype)
+
+    def fields(self):
+        return {"dst": self.dst, "src": self.src, "type": self.type}
+
+    def answers(self, other):
+        """
+        Whether this frame is the switch's reply to `other`: a 0x1234 frame
+        with the 'P4' magic, of the same protocol.
+        """
+        return isinstance(other, Ether) and self.type == other.type and isinstance(self.payload, Packet)
+
+
+class IP(Layer):
+    """
+    IPv4 header without options; length and checksum are computed.
+    """
+    name = "IP"
+
+    def __init__(self, dst="127.0.0.1", src=None, ttl=64, proto=None, id=1, tos=0):
+        self.dst = dst
+        self.src = src
+        self.ttl = ttl
+        self.proto = proto
+        self.id = id
+        self.tos = tos
+
+    def addresses(self):
+        return socket.inet_aton(self.src or "0.0.0.0"), socket.inet_aton(self.dst)
+
+    def header(self, payload, under):
+        proto = self.proto
+        if proto is None:
+            proto = IPPROTO_TCP if isinstance(self.payload, TCP) else IPPROTO_UDP if isinstance(self.payload, UDP) else 0
+        src, dst = self.addresses()
+        fields = [0x45, self.tos, IPV4.size + len(payload), self.id, 0, self.ttl, proto, 0, src, dst]
+        fields[7] = checksum(IPV4.pack(*fields))
+        return IPV4.pack(*fields)
+
+    def fields(self):
+        return {"src": self.src, "dst": self.dst, "ttl": self.ttl, "proto": self.proto}
+
+
+def _pseudo_checksum(under, proto, segment):
+    if not isinstance(under, IP):
+        return 0
+    src, dst = under.addresses()
+    return checksum(PSEUDO.pack(src, dst, 0, proto, len(segment)) + segment)
+
+
+class TCP(Layer):
+    """
+    TCP header without options, with scapy's defaults (a SYN, window 8192).
+    """
+    name = "TCP"
+    FLAGS = {"F": 0x01, "S": 0x02, "R": 0x04, "P": 0x08, "A": 0x10, "U": 0x20}
+
+    def __init__(self, sport=20, dport=80, seq=0, ack=0, flags="S", window=8192):
+        self.sport = sport
+        self.dport = dport
+        self.seq = seq
+        self.ack = ack
+        self.flags = flags
+        self.window = window
+
+    def header(self, payload, under):
+        flags = self.flags if isinstance(self.flags, int) else sum(self.FLAGS[f] for f in self.flags)
+        fields = [self.sport, self.dport, self.seq, self.ack, 5 << 4, flags, self.window, 0, 0]
+        fields[7] = _pseudo_checksum(under, IPPROTO_TCP, TCP_HEADER.pack(*fields) + payload)
+        return TCP_HEADER.pack(*fields)
+
+    def fields(self):
+        return {"sport": self.sport, "dport": self.dport, "flags": self.flags}
+
+
+class UDP(Layer):
+    name = "UDP"
+
+    def __init__(self, sport=53, dport=53):
+        self.sport = sport
+        self.dport = dport
+
+    def header(self, payload, under):
+        length = UDP_HEADER.size + len(payload)
+        check = _pseudo_checksum(under, IPPROTO_UDP, UDP_HEADER.pack(self.sport, self.dport, length, 0) + payload)
+        return UDP_HEADER.pack(self.sport, self.dport, length, check or 0xffff)
+
+    def fields(self):
+        return {"sport": self.sport, "dport": self.dport}
+
+
+class Field:
+    """
+    A header field of `bits` bits. The arguments are kept so that the field
+    can be rebuilt as the scapy field of the same name (to_scapy()).
+    """
+    bits = 8
+
+    def __init__(self, name, default, *args, **kwargs):
+        self.name = name
+        self.default = default
+        self.args = args
+        self.kwargs = kwargs
+
+    def i2m(self, value):
+        # like struct.pack in scapy: a value that does not fit fails to build
+        if not 0 <= value < 1 << self.bits:
+            raise ValueError(f"{self.name}={value} does not fit in {self.bits} bits")
+        return value
+
+    def m2i(self, value):
+        return value
+
+
+class StrFixedLenField(Field):
+    def __init__(self, name, default, length=1):
+        super().__init__(name, default, length=length)
+        self.bits = 8 * length
+
+    def i2m(self, value):
+        value = value.encode() if isinstance(value, str) else bytes(value)
+        return int.from_bytes(value.ljust(self.bits // 8, b"\0")[:self.bits // 8], "big")
+
+    def m2i(self, value):
+        return value.to_bytes(self.bits // 8, "big")
+
+
+class ByteField(Field):
+    pass
+
+
+class XByteField(Field):
+    pass
+
+
+class ShortField(Field):
+    bits = 16
+
+
+class IntField(Field):
+    bits = 32 # unsigned, like scapy's "!I"
+
+
+class BitField(Field):
+    def __init__(self, name, default, size):
+        super().__init__(name, default, size)
+        self.bits = size
+
+    def i2m(self, value):
+        return value & ((1 << self.bits) - 1) # scapy masks BitFields
+
+
+class Packet(Layer):
+    """
+    A custom header defined by fields_desc, as in scapy. Fields are packed
+    MSB first, so BitFields can share a byte; the total must be whole bytes.
+    """
+    fields_desc = []
+
+    def __init__(self, _pkt=None, **fields):
+        for field in self.fields_desc:
+            setattr(self, field.name, fields.pop(field.name, field.default))
+        if fields:
+            raise AttributeError(f"{self.name} has no field {', '.join(fields)}")
+        if _pkt is not None:
+            self.decode(bytes(_pkt))
+
+    @classmethod
+    def size(cls):
+        return sum(field.bits for field in cls.fields_desc) // 8
+
+    @classmethod
+    def dispatch_hook(cls, _pkt=None, *args, **kargs):
+        return cls
+
+    def decode(self, data):
+        size = self.size()
+        value = int.from_bytes(data[:size], "big")
+        shift = 8 * size
+        for field in self.fields_desc:
+            shift -= field.bits
+            setattr(self, field.name, field.m2i((value >> shift) & ((1 << field.bits) - 1)))
+        if len(data) > size:
+            self.payload = Raw(data[size:])
+        return self
+
+    def header(self, payload, under):
+        value = 0
+        for field in self.fields_desc:
+            value = value << field.bits | field.i2m(getattr(self, field.name))
+        return value.to_bytes(self.size(), "big")
+
+    def fields(self):
+        return {field.name: getattr(self, field.name) for field in self.fields_desc}
+
+    def __repr__(self):
+        return f"<{self.name} " + " ".join(f"{k}={v!r}" for k, v in self.fields().items()) + ">"
+
+
+def bind_layers(lower, upper, type):
+    """
+    Decodes Ethernet frames of this ethertype as `upper`.
+    """
+    _bindings[type] = upper
+
+
+def raw(pkt):
+    return bytes(pkt)
+
+
+def _scapy_class(cls):
+    """
+    Builds (once) the scapy Packet class with the same fields as cls, so that
+    scapy's show() can dissect the custom header.
+    """
+    if cls not in _scapy_classes:
+        from scapy import fields as scapy_fields
+        from scapy.packet import Packet as ScapyPacket
+        fields_desc = [getattr(scapy_fields, type(f).__name__)(f.name, f.default, *f.args, **f.kwargs)
+                       for f in cls.fields_desc]
+        _scapy_classes[cls] = type(cls.__name__, (ScapyPacket,), {"name": cls.name, "fields_desc": fields_desc})
+    return _scapy_classes[cls]
+
+
+def get_if_list():
+    return sorted(os.listdir("/sys/class/net"))
+
+
+def get_if_hwaddr(iface):
+    with open(f"/sys/class/net/{iface}/address") as f:
+        return f.read().strip()
+
+
+def l2socket(iface):
+    """
+    A raw socket that sends and receives whole Ethernet frames on iface.
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    sock.bind((iface, 0))
+    return sock
+
+
+def _fill_src(pkt, sock):
+    if isinstance(pkt, Ether) and pkt.src is None:
+        pkt = copy.copy(pkt)
+        pkt.src = bytes2mac(sock.getsockname()[4])
+    return bytes(pkt)
+
+
+def _open(iface):
+    """
+    The socket of iface, opened on first use and kept open: binding and closing
+    a packet socket waits for the kernel to synchronize (about 10 ms), which
+    would otherwise be paid on every srp1().
+    """
+    if iface not in _sockets:
+        _sockets[iface] = l2socket(iface)
+    return _sockets[iface]
+
+
+def sendp(pkt, iface=None, inter=0, count=1, verbose=None):
+    """
+    Sends a frame `count` times, sleeping `inter` seconds after each, like
+    scapy's sendp().
+    """
+    sock = _open(iface)
+    data = _fill_src(pkt, sock)
+    for _ in range(count):
+        sock.send(data)
+        if inter:
+            time.sleep(inter)
+
+
+def srp1(pkt, iface=None, timeout=None, verbose=None):
+    """
+    Sends a frame and returns the first reply that answers it (see
+    Ether.answers), decoded, or None after `timeout` seconds.
+    """
+    sock = _open(iface)
+    # frames queued since the last call (e.g. the late reply to a request that
+    # timed out) are not answers to this one
+    sock.setblocking(False)
+    try:
+        while True:
+            sock.recv(65535)
+    except BlockingIOError:
+        pass
+    sock.setblocking(True)
+    sock.send(_fill_src(pkt, sock))
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        while True:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                sock.settimeout(remaining)
+            try:
+                data, address = sock.recvfrom(65535)
+            except socket.timeout:
+                return None
+            if address[2] == socket.PACKET_OUTGOING:
+                continue # our own request
+            if len(data) >= ETHERNET.size + 2 and data[ETHERNET.size:ETHERNET.size + 2] == P4_MAGIC:
+                reply = Ether(data)
+                if reply.answers(pkt):
+                    return reply
+    finally:
+        # the socket is shared with sendp() and later calls: back to blocking
+        sock.settimeout(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode and decode sample frames of the custom protocols")
+    parser.add_argument("--show", action="store_true", help="print them with scapy's show()")
+    args = parser.parse_args()
+
+    class P4calc(Packet):
+        name = "P4calc"
+        fields_desc = [StrFixedLenField("P", "P", length=1),
+                       StrFixedLenField("Four", "4", length=1),
+                       XByteField("version", 0x01),
+                       StrFixedLenField("op", "+", length=1),
+                       IntField("operand_a", 0),
+                       IntField("operand_b", 0),
+                       IntField("result", 0xDEADBABE)]
+
+    bind_layers(Ether, P4calc, type=P4_ETYPE)
+    pkt = Ether(dst="e4:5f:01:84:8c:5e", type=P4_ETYPE) / P4calc(op="-", operand_a=3, operand_b=5) / " "
+    data = raw(pkt)
+    print(f"{pkt.summary()}: {len(data)} bytes\n{data.hex()}")
+    print(Ether(data)[P4calc])
+    if args.show:
+        pkt.show()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+"""
+Round-trip latency benchmark of the custom 0x1234 protocols.
+
+Sends a stream of P4calc or P4Traffic requests (any layout of p4decode.py)
+to a switch, or to a reflector on the other end of a veth pair, and measures
+the round trip of every request. Each request carries its sequence number as
+payload after the header, which the switch sends back unchanged, so replies
+are matched exactly even when many requests are in flight.
+
+Modes:
+- stop-and-wait (--window 1, the default): one request in flight, like the clients.
+- windowed (--window N): N requests in flight (raw transport only).
+
+Transports:
+- raw: one AF_PACKET socket for the whole run and prebuilt frames; the kernel
+  timestamps every reply (SO_TIMESTAMPNS), so the report also gives the time
+  from the kernel receiving the reply to the client reading it.
+- srp1: p4pkt.srp1 with a packet built per request, as the clients send.
+- scapy: scapy's srp1, as the clients sent before p4pkt.
+
+The report gives p50/p90/p99/p99.9 of the RTT (from a LatencySketch, see
+assignment2/sketch.py) and the client CPU time (user and system) per request.
+
+Usage:
+    ip link add veth0 type veth peer name veth1 && ip link set veth0 up && ip link set veth1 up
+    sudo python3 p4rtt.py --iface veth0 --reflector veth1 --count 10000
+    sudo python3 p4rtt.py --iface veth0 --reflector veth1 --window 32 --layout v8
+    sudo python3 p4rtt.py --iface enx0c37965f8a0f --transport srp1 --layout calc -o calc.sketch
+"""
+
+import argparse
+import os
+import random
+import resource
+import select
+import socket
+import struct
+import sys
+import time
+from multiprocessing import Process
+
+from p4pkt import Ether, bind_layers, l2socket, bytes2mac, srp1, P4_ETYPE, P4_MAGIC
+import p4decode
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assignment2"))
+from sketch import LatencySketch, QUANTILES
+
+DST_MAC = "e4:5f:01:84:8c:5e"
+COUNT = 1000 # Requests per run
+WARMUP = 100 # Requests sent before the measured ones
+TIMEOUT = 1.0 # Seconds after which a request counts as lost
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35) # Linux value, missing from older Pythons
+SEQ = struct.Struct("!Q")
+TIMESPEC = struct.Struct("ll")
+TRANSPORTS = ("raw", "srp1", "scapy")
+
+
+def request_fields(layout):
+    """
+    Header fields of one request: random operands for P4calc, the defaults of
+    the client's P4Traffic (a step of junction 0 for v8).
+    """
+    if layout.name == "calc":
+        return {"op": random.choice("+-&|^"), "operand_a": random.randrange(1 << 31),
+                "operand_b": random.randrange(1 << 31)}
+    return {}
+
+
+def build(layout, fields, seq, src):
+    return Ether(dst=DST_MAC, src=src, type=P4_ETYPE) / layout.cls(**fields) / SEQ.pack(seq)
+
+
+def reply_seq(data, layout):
+    """
+    The sequence number of a reply of `layout`, or None for any other frame.
+    """
+    if len(data) < layout.size + SEQ.size or data[12:14] != b"\x12\x34" or data[14:16] != P4_MAGIC:
+        return None
+    return SEQ.unpack_from(data, layout.size)[0]
+
+
+def reflect(iface):
+    """
+    Sends every 0x1234 frame received on iface back with its MACs swapped, like
+    assignment4/reflector.p4. Runs until killed.
+    """
+    sock = l2socket(iface)
+    while True:
+        data, address = sock.recvfrom(65535)
+        if address[2] != socket.PACKET_OUTGOING and data[12:14] == b"\x12\x34" and data[14:16] == P4_MAGIC:
+            sock.send(data[6:12] + data[0:6] + data[12:])
+
+
+class Run:
+    """
+    Samples of one run: RTT and kernel-to-user delay in ms, lost requests.
+    """
+
+    def __init__(self):
+        self.rtt = LatencySketch()
+        self.wakeup = LatencySketch()
+        self.lost = 0
+        self.unmatched = 0
+
+
+def run_raw(iface, layout, count, window, timeout, run):
+    """
+    Windowed (or stop-and-wait for window 1) requests on one socket. The frames
+    are built up front, so the RTT covers only sending and receiving (the CPU
+    time per request still includes building them).
+    """
+    sock = l2socket(iface)
+    sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    src = bytes2mac(sock.getsockname()[4])
+    frames = [bytes(build(layout, request_fields(layout), seq, src)) for seq in range(count)]
+    sent = {} # seq -> perf_counter_ns when sent, oldest first
+    next_seq = 0
+    done = 0
+    ancillary = socket.CMSG_SPACE(TIMESPEC.size)
+    while done < count:
+        while next_seq < count and len(sent) < window:
+            sent[next_seq] = time.perf_counter_ns()
+            sock.send(frames[next_seq])
+            next_seq += 1
+        oldest = next(iter(sent))
+        wait = timeout - (time.perf_counter_ns() - sent[oldest]) / 1e9
+        if wait <= 0 or not select.select([sock], [], [], wait)[0]:
+            # the oldest request timed out
+            del sent[oldest]
+            run.lost += 1
+            done += 1
+            continue
+        data, ancdata, _, address = sock.recvmsg(65535, ancillary)
+        received = time.perf_counter_ns()
+        received_wall = time.time_ns() # same clock as the kernel timestamp
+        if address[2] == socket.PACKET_OUTGOING:
+            continue
+        seq = reply_seq(data, layout)
+        if seq not in sent:
+            run.unmatched += int(seq is not None)
+            continue
+        run.rtt.add((received - sent.pop(seq)) / 1e6)
+        for level, kind, value in ancdata:
+            if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS:
+                sec, nsec = TIMESPEC.unpack(value)
+                # kernel receive time to the client having the frame: the receive path of the stack
+                run.wakeup.add(max(received_wall - (sec * 10**9 + nsec), 0) / 1e6)
+        done += 1
+    sock.close()
+
+
+def run_srp1(iface, layout, count, timeout, run, use_scapy=False):
+    """
+    Stop-and-wait with one srp1 per request; the packet is built per request,
+    as in the clients.
+    """
+    if use_scapy:
+        from scapy.all import srp1 as send_receive, raw
+        src = None
+    else:
+        send_receive, raw = srp1, bytes
+        # as the client does on import, so replies decode as this layout (and answer the request)
+        bind_layers(Ether, layout.cls, type=P4_ETYPE)
+        with open(f"/sys/class/net/{iface}/address") as f:
+            src = f.read().strip()
+    for seq in range(count):
+        pkt = build(layout, request_fields(layout), seq, src)
+        if use_scapy:
+            pkt = pkt.to_scapy()
+        started = time.perf_counter_ns()
+        resp = send_receive(pkt, iface=iface, timeout=timeout, verbose=False)
+        received = time.perf_counter_ns()
+        if resp is None:
+            run.lost += 1
+        elif reply_seq(raw(resp), layout) != seq:
+            run.unmatched += 1
+        else:
+            run.rtt.add((received - started) / 1e6)
+
+
+def measure(args, layout, count):
+    run = Run()
+    if args.transport == "raw":
+        run_raw(args.iface, layout, count, args.window, args.timeout, run)
+    else:
+        run_srp1(args.iface, layout, count, args.timeout, run, use_scapy=args.transport == "scapy")
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-trip latency of the 0x1234 protocols")
+    parser.add_argument("--iface", required=True, help="interface towards the switch or reflector")
+    parser.add_argument("--reflector", metavar="IFACE", help="run a MAC-swapping reflector on this interface (a veth peer)")
+    parser.add_argument("--layout", default="calc", help="request layout (see p4decode.py --list)")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="raw")
+    parser.add_argument("--window", type=int, default=1, help="requests in flight (1: stop-and-wait)")
+    parser.add_argument("--count", type=int, default=COUNT)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds before a request counts as lost")
+    parser.add_argument("-o", "--output", help="save the RTT sketch (for assignment2/sketch.py)")
+    args = parser.parse_args()
+
+    layouts = p4decode.layouts()
+    if args.layout not in layouts:
+        parser.error(f"unknown layout {args.layout}, one of {', '.join(layouts)}")
+    if args.window > 1 and args.transport != "raw":
+        parser.error("only the raw transport can keep several requests in flight")
+    layout = layouts[args.layout]
+
+    reflector = None
+    if args.reflector:
+        reflector = Process(target=reflect, args=(args.reflector,), daemon=True)
+        reflector.start()
+        time.sleep(0.2) # let it bind before the first request
+    try:
+        if args.warmup:
+            measure(args, layout, args.warmup)
+        before = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.perf_counter()
+        run = measure(args, layout, args.count)
+        elapsed = time.perf_counter() - started
+        after = resource.getrusage(resource.RUSAGE_SELF)
+    finally:
+        if reflector is not None:
+            reflector.terminate()
+
+    mode = "stop-and-wait" if args.window == 1 else f"window {args.window}"
+    print(f"{args.count} {args.layout} requests, {args.transport}, {mode}: {run.rtt.total} answered, "
+          f"{run.lost} lost, {run.unmatched} unmatched, {args.count / elapsed:.0f} requests/s")
+    header = " ".join(f"{'p' + format(100 * q, 'g'):>9}" for q in QUANTILES)
+    print(f"{'ms':22} {header} {'mean':>9}")
+    for name, sketch in (("RTT", run.rtt), ("kernel to client", run.wakeup)):
+        if sketch.total:
+            values = " ".join(f"{v:9.3f}" for v in sketch.quantiles(QUANTILES))
+            print(f"{name:22} {values} {sketch.mean():9.3f}")
+    user = (after.ru_utime - before.ru_utime) / args.count * 1e6
+    system = (after.ru_stime - before.ru_stime) / args.count * 1e6
+    print(f"client CPU per request: {user + system:.1f} us ({user:.1f} user, {system:.1f} system)")
+    if args.output:
+        run.rtt.save(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+"""
+Fast streaming pcap reader and single-pass traffic analyzer.
+
+scapy's rdpcap() builds a full Packet object for every frame and keeps the whole
+capture in memory. PcapReader instead maps the file with mmap and yields
+zero-copy memoryview slices of each frame; parse() decodes only the headers we
+care about (Ethernet/802.1Q, IPv4, TCP/UDP and the 0x1234 'P4' custom headers)
+with struct. analyze() computes per-flow packet/byte counts, a throughput time
+series and inter-arrival distributions in one pass.
+
+Usage:
+    python3 pcapstream.py ../assignment3/captured.pcap
+    python3 pcapstream.py --bin 0.1 --throughput throughput.data big.pcap
+The throughput file has the same "x y" format as the processed logs, so
+assignment2/plot.py can plot it.
+"""
+
+import argparse
+import math
+import mmap
+import os
+import socket
+import struct
+import time
+from array import array
+from collections import namedtuple
+
+# pcap magic numbers and the resolution of their timestamps
+MAGICS = {0xa1b2c3d4: 1e-6, 0xa1b23c4d: 1e-9}
+LINKTYPE_ETHERNET = 1
+
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+P4_ETYPE = 0x1234 # Ethertype of the custom protocols (P4calc, P4Traffic)
+P4_MAGIC = b"P4"
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+
+ETHERNET = struct.Struct("!6s6sH")
+IPV4 = struct.Struct("!BBHHHBBH4s4s")
+PORTS = struct.Struct("!HH")
+_ethernet = ETHERNET.unpack_from
+_ipv4 = IPV4.unpack_from
+_ports = PORTS.unpack_from
+
+Headers = namedtuple("Headers", ["dst", "src", "ethertype", "ip_src", "ip_dst", "proto",
+                                 "sport", "dport", "payload", "p4_version"])
+Headers.__doc__ = """
+Decoded headers of one frame. MACs and IPv4 addresses are bytes, fields of
+layers that are not present are None, and payload is the offset of the first
+byte after the last decoded header.
+"""
+
+
+class PcapReader:
+    """
+    Memory-mapped reader of a classic (libpcap) capture file.
+    Iterating yields (timestamp, frame, original length) where frame is a
+    memoryview of the mapped file, so it is only valid until close().
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, "rb")
+        if os.fstat(self.file.fileno()).st_size < 24:
+            self.file.close()
+            raise ValueError(f"{filename} is too short to be a pcap file")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic = struct.unpack_from("<I", self.map, 0)[0]
+        if magic in MAGICS:
+            self.endian = "<"
+        elif struct.unpack_from(">I", self.map, 0)[0] in MAGICS:
+            self.endian = ">"
+            magic = struct.unpack_from(">I", self.map, 0)[0]
+        else:
+            self.close()
+            raise ValueError(f"{filename} is not a pcap file (pcapng is not supported)")
+        self.resolution = MAGICS[magic]
+        _, _, _, _, self.snaplen, self.linktype = struct.unpack_from(self.endian + "HHiIII", self.map, 4)
+        if self.linktype != LINKTYPE_ETHERNET:
+            self.close()
+            raise ValueError(f"{filename} has link type {self.linktype}, only Ethernet is supported")
+        self.record = struct.Struct(self.endian + "IIII")
+        self.view = memoryview(self.map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        unpack = self.record.unpack_from
+        buf = self.map
+        view = self.view
+        resolution = self.resolution
+        end = len(buf)
+        offset = 24
+        while offset + 16 <= end:
+            sec, frac, incl, orig = unpack(buf, offset)
+            offset += 16
+            if offset + incl > end:
+                break # truncated last record
+            yield sec + frac * resolution, view[offset:offset + incl], orig
+            offset += incl
+
+    def records(self):
+        """
+        Returns arrays of (timestamp, offset, captured length, original length)
+        of every record, where offset points at the first byte of the frame in
+        self.map. Useful to decode all frames at once with NumPy.
+        """
+        ts = array("d")
+        offsets = array("Q")
+        incls = array("I")
+        origs = array("I")
+        unpack = self.record.unpack_from
+        end = len(self.map)
+        offset = 24
+        while offset + 16 <= end:
+            sec, frac, incl, orig = unpack(self.map, offset)
+            offset += 16
+            if offset + incl > end:
+                break
+            ts.append(sec + frac * self.resolution)
+            offsets.append(offset)
+            incls.append(incl)
+            origs.append(orig)
+            offset += incl
+        return ts, offsets, incls, origs
+
+    def close(self):
+        if getattr(self, "view", None) is not None:
+            try:
+                self.view.release()
+            except BufferError:
+                pass # frames are still referenced; the map is freed with them
+            self.view = None
+        try:
+            self.map.close()
+        except (AttributeError, BufferError):
+            pass
+        self.file.close()
+
+
+def parse(frame):
+    """
+    Decodes the Ethernet (with an optional 802.1Q tag), IPv4 and TCP/UDP headers,
+    and the version byte of a 0x1234 custom header after the 'P4' magic.
+    Returns a Headers tuple, or None if the frame is shorter than an Ethernet header.
+    """
+    length = len(frame)
+    if length < 14:
+        return None
+    dst, src, ethertype = _ethernet(frame, 0)
+    offset = 14
+    if ethertype == ETH_P_8021Q and length >= 18:
+        ethertype = _ports(frame, 16)[0]
+        offset = 18
+    if ethertype == ETH_P_IP and length >= offset + 20:
+        ver_ihl, _, _, _, _, _, proto, _, ip_src, ip_dst = _ipv4(frame, offset)
+        offset += (ver_ihl & 0x0f) * 4
+        if (proto == IPPROTO_UDP or proto == IPPROTO_TCP) and length >= offset + 4:
+            sport, dport = _ports(frame, offset)
+            if proto == IPPROTO_UDP:
+                offset += 8
+            elif length >= offset + 13:
+                offset += (frame[offset + 12] >> 4) * 4 # data offset: the TCP header with its options
+            else:
+                offset += 20
+            return Headers(dst, src, ethertype, ip_src, ip_dst, proto, sport, dport, offset, None)
+        return Headers(dst, src, ethertype, ip_src, ip_dst, proto, None, None, offset, None)
+    if ethertype == P4_ETYPE and length >= offset + 3 and frame[offset:offset + 2] == P4_MAGIC:
+        return Headers(dst, src, ethertype, None, None, None, None, None, offset, frame[offset + 2])
+    return Headers(dst, src, ethertype, None, None, None, None, None, offset, None)
+
+
+def mac_str(mac):
+    return ":".join(f"{b:02x}" for b in mac)
+
+
+def flow_key(h):
+    """
+    Flow identifier of a decoded frame: the 5-tuple for IPv4, the MAC pair and
+    protocol version for the custom protocols, and the MAC pair and ethertype otherwise.
+    """
+    if h.ip_src is not None:
+        return ("ipv4", h.proto, h.ip_src, h.sport or 0, h.ip_dst, h.dport or 0)
+    if h.p4_version is not None:
+        return ("p4", h.p4_version, h.src, h.dst)
+    return ("eth", h.ethertype, h.src, h.dst)
+
+
+def flow_str(key):
+    if key[0] == "ipv4":
+        _, proto, src, sport, dst, dport = key
+        name = {IPPROTO_TCP: "TCP", IPPROTO_UDP: "UDP"}.get(proto, f"proto {proto}")
+        return f"{name} {socket.inet_ntoa(src)}:{sport} > {socket.inet_ntoa(dst)}:{dport}"
+    if key[0] == "p4":
+        return f"P4 v{key[1]} {mac_str(key[2])} > {mac_str(key[3])}"
+    return f"0x{key[1]:04x} {mac_str(key[2])} > {mac_str(key[3])}"
+
+
+class GapHistogram:
+    """
+    Log-scale histogram of inter-arrival gaps in whole microseconds, with four
+    buckets per power of two (at most 25% wide), in constant memory.
+    The bucket index is computed from the bit length of the gap, without logarithms.
+    Negative gaps (timestamps out of order) are only counted, in `negative`.
+    """
+    SIZE = 160 # enough for gaps of 2^40 us, about 12 days
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * self.SIZE))
+        self.total = 0
+        self.negative = 0
+
+    def add(self, gap):
+        if gap < 0:
+            self.negative += 1
+            return
+        us = int(gap * 1e6)
+        n = us.bit_length()
+        if n > 2:
+            # the three leading bits (4..7) pick the bucket within the power of two
+            us = (n - 3) * 4 + (us >> (n - 3))
+            if us >= self.SIZE:
+                us = self.SIZE - 1
+        self.counts[us] += 1
+        self.total += 1
+
+    @staticmethod
+    def upper_edge(i):
+        if i < 4:
+            return (i + 1) * 1e-6
+        return ((i % 4 + 5) << (i // 4 - 1)) * 1e-6
+
+    def quantile(self, q):
+        """
+        Returns the upper edge of the bucket holding quantile q, in seconds.
+        """
+        if not self.total:
+            return math.nan
+        rank = q * (self.total - 1)
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if rank < cumulative:
+                return self.upper_edge(i)
+        return math.nan
+
+
+class Flow:
+    __slots__ = ("packets", "bytes", "first", "last", "gaps")
+
+    def __init__(self, ts):
+        self.packets = 0
+        self.bytes = 0
+        self.first = ts
+        self.last = ts
+        self.gaps = GapHistogram()
+
+
+def analyze(reader, bin_width=1.0):
+    """
+    Single pass over a PcapReader. Returns (flows, throughput, gaps) where flows
+    maps flow_key() to Flow, throughput is an array of bytes per bin_width
+    seconds since the first packet, and gaps is the GapHistogram of all packets.
+    """
+    flows = {}
+    throughput = array("Q")
+    gaps = GapHistogram()
+    start = last = None
+    for ts, frame, orig in reader:
+        h = parse(frame)
+        if h is None:
+            continue
+        if start is None:
+            start = last = ts
+        else:
+            gaps.add(ts - last)
+            last = max(last, ts)
+        i = max(int((ts - start) / bin_width), 0)
+        if i >= len(throughput):
+            throughput.frombytes(bytes(8 * (i + 1 - len(throughput))))
+        throughput[i] += orig
+
+        key = flow_key(h)
+        flow = flows.get(key)
+        if flow is None:
+            flow = flows[key] = Flow(ts)
+        else:
+            flow.gaps.add(ts - flow.last)
+            flow.last = max(flow.last, ts)
+        flow.packets += 1
+        flow.bytes += orig
+    return flows, throughput, gaps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-pass flow, throughput and inter-arrival analysis of a pcap file")
+    parser.add_argument("filename")
+    parser.add_argument("--top", type=int, default=10, help="number of flows to list, by bytes")
+    parser.add_argument("--bin", type=float, default=1.0, help="throughput bin width in seconds")
+    parser.add_argument("--throughput", metavar="FILE", help="write '<bin end> <Mbits/sec>' lines to FILE")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with PcapReader(args.filename) as reader:
+        flows, throughput, gaps = analyze(reader, args.bin)
+    elapsed = time.perf_counter() - started
+
+    packets = sum(f.packets for f in flows.values())
+    total = sum(f.bytes for f in flows.values())
+    size = os.path.getsize(args.filename)
+    print(f"{packets} packets, {total} bytes, {len(flows)} flows, {len(throughput) * args.bin:g} s of traffic")
+    print(f"processed {size / 1e6:.1f} MB in {elapsed:.2f} s ({size / 1e6 / max(elapsed, 1e-9):.0f} MB/s)")
+    print(f"inter-arrival p50 {gaps.quantile(0.5) * 1e3:.3f} ms, p99 {gaps.quantile(0.99) * 1e3:.3f} ms")
+    if gaps.negative:
+        print(f"{gaps.negative} packets with a timestamp before the previous packet (not in the gaps)")
+    print()
+    print(f"{'flow':60} {'packets':>8} {'bytes':>10} {'gap p50 ms':>11} {'gap p99 ms':>11}")
+    for key, flow in sorted(flows.items(), key=lambda kv: kv[1].bytes, reverse=True)[:args.top]:
+        print(f"{flow_str(key):60} {flow.packets:8} {flow.bytes:10} "
+              f"{flow.gaps.quantile(0.5) * 1e3:11.3f} {flow.gaps.quantile(0.99) * 1e3:11.3f}")
+
+    if args.throughput:
+        with open(args.throughput, "w") as f:
+            for i, count in enumerate(throughput):
+                f.write(f"{(i + 1) * args.bin:g} {count * 8 / args.bin / 1e6:g}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+"""
+Route aggregation compiler for the MyIngress.ipv4_lpm table.
+
+commands.txt installs one /32 entry per host. When contiguous hosts share the
+same next hop (MAC and port), fewer, shorter prefixes forward exactly the same
+way. compile_routes() builds a binary trie of the routes and runs ORTC
+(Optimal Routing Table Constructor, Draves et al. 1999) over it, which gives
+the smallest LPM table with the same forwarding decision for every address.
+Addresses without a route stay without one: where a shorter prefix would
+otherwise cover them, a drop entry is emitted (--drop-action).
+
+Lpm gives a fast longest-prefix-match lookup in Python, and verify() compares
+two tables at every address where either of them can change its decision,
+which proves they are equivalent.
+
+Input lines are either table_add commands (as in commands.txt) or
+"<address>[/<prefix length>] <action parameters...>" lines.
+
+Usage:
+    python3 routes.py hosts.txt -o commands.txt
+    python3 routes.py --verify commands.txt
+"""
+
+import argparse
+import socket
+import struct
+import sys
+
+import controlplane
+
+TABLE = "MyIngress.ipv4_lpm"
+ACTION = "MyIngress.ipv4_forward"
+DROP_ACTION = "MyIngress.drop"
+WIDTH = 32
+
+
+def ip_to_int(addr):
+    return struct.unpack("!I", socket.inet_aton(addr))[0]
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(struct.pack("!I", value))
+
+
+def param_token(token):
+    """
+    Canonical spelling of an action parameter (lowercase MAC, dotted IPv4,
+    decimal number), so equal next hops written differently compare equal.
+    """
+    value = controlplane.value(token)
+    width = controlplane.field_width(token)
+    if width == 48:
+        return ":".join(f"{b:02x}" for b in value.to_bytes(6, "big"))
+    if width == 32:
+        return int_to_ip(value)
+    return str(value)
+
+
+def read_routes(lines, action=ACTION):
+    """
+    Returns {(prefix value, prefix length): next hop} where the next hop is the
+    (action, action parameters) tuple of the route, with the parameters in
+    their canonical spelling (see param_token).
+    """
+    routes = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("table_add "):
+            entry = controlplane.parse_table_add(line)
+            key, params = entry.tokens
+            if len(key) != 1:
+                raise ValueError(f"expected a single LPM key: {line}")
+            prefix, hop = key[0], (entry.action, tuple(param_token(p) for p in params))
+        elif line.startswith("table_"):
+            continue
+        else:
+            fields = line.split()
+            prefix, hop = fields[0], (action, tuple(param_token(p) for p in fields[1:]))
+        addr, _, length = prefix.partition("/")
+        length = int(length) if length else WIDTH
+        value = ip_to_int(addr) & ~((1 << (WIDTH - length)) - 1) & 0xffffffff
+        routes[value, length] = hop
+    return routes
+
+
+class Node:
+    __slots__ = ("children", "hop", "hops", "chosen")
+
+    def __init__(self, hop=None):
+        self.children = [None, None]
+        self.hop = hop      # next hop of a route ending here, if any
+        self.hops = None    # ORTC candidate set
+        self.chosen = None  # next hop of the compiled entry here, if any
+
+
+def build_trie(routes):
+    root = Node()
+    for (value, length), hop in routes.items():
+        node = root
+        for i in range(length):
+            bit = (value >> (WIDTH - 1 - i)) & 1
+            if node.children[bit] is None:
+                node.children[bit] = Node()
+            node = node.children[bit]
+        node.hop = hop
+    return root
+
+
+def _normalize(node, inherited):
+    """
+    ORTC pass 1 and 2: pushes next hops down so every node has zero or two
+    children, then computes each node's candidate set bottom-up.
+    None stands for "no route".
+    """
+    hop = node.hop if node.hop is not None else inherited
+    zero, one = node.children
+    if zero is None and one is None:
+        node.hops = frozenset([hop])
+        return
+    if zero is None:
+        zero = node.children[0] = Node()
+    if one is None:
+        one = node.children[1] = Node()
+    _normalize(zero, hop)
+    _normalize(one, hop)
+    common = zero.hops & one.hops
+    node.hops = common if common else zero.hops | one.hops
+
+
+def _pick(hops):
+    # prefer "no route", then a stable order, so the output is deterministic
+    return None if None in hops else min(hops)
+
+
+def _select(node, inherited):
+    """
+    ORTC pass 3: a node only needs an entry when the next hop it inherits is
+    not one of its candidates.
+    """
+    if inherited in node.hops:
+        hop = inherited
+    else:
+        hop = node.chosen = _pick(node.hops)
+        if hop is None:
+            node.chosen = "drop"
+    for child in node.children:
+        if child is not None:
+            _select(child, hop)
+
+
+def compile_routes(routes):
+    """
+    Returns the minimal {(prefix value, prefix length): next hop} table that
+    forwards every address like `routes`. A next hop of None is an entry that
+    must drop (it punches a hole in a shorter prefix).
+    """
+    root = build_trie(routes)
+    _normalize(root, None)
+    _select(root, None)
+    compiled = {}
+    stack = [(root, 0, 0)]
+    while stack:
+        node, value, length = stack.pop()
+        if node.chosen is not None:
+            compiled[value, length] = None if node.chosen == "drop" else node.chosen
+        for bit, child in enumerate(node.children):
+            if child is not None:
+                stack.append((child, value | (bit << (WIDTH - 1 - length)), length + 1))
+    return compiled
+
+
+class Lpm:
+    """
+    Longest-prefix-match lookup over a {(value, length): next hop} table:
+    one dict per prefix length in use, probed from the longest length down.
+    """
+
+    def __init__(self, table):
+        by_length = {}
+        for (value, length), hop in table.items():
+            by_length.setdefault(length, {})[value] = hop
+        self.levels = [(~((1 << (WIDTH - length)) - 1) & 0xffffffff, by_length[length])
+                       for length in sorted(by_length, reverse=True)]
+
+    def lookup(self, addr):
+        """
+        Returns the next hop of an address (int or dotted string), or None if
+        no entry matches or the matching entry drops.
+        """
+        if isinstance(addr, str):
+            addr = ip_to_int(addr)
+        for mask, entries in self.levels:
+            hop = entries.get(addr & mask, self)
+            if hop is not self:
+                return hop
+        return None
+
+
+def verify(original, compiled):
+    """
+    Compares two tables at the first address of every prefix of either table
+    and the address right after it. Forwarding can only change at those
+    addresses, so this is an exact equivalence check.
+    Returns the list of (address, original hop, compiled hop) that differ.
+    """
+    a = Lpm(original)
+    b = Lpm(compiled)
+    points = {0}
+    for value, length in list(original) + list(compiled):
+        points.add(value)
+        end = value + (1 << (WIDTH - length))
+        if end <= 0xffffffff:
+            points.add(end)
+    return [(p, a.lookup(p), b.lookup(p)) for p in sorted(points) if a.lookup(p) != b.lookup(p)]
+
+
+def to_commands(table, name=TABLE, drop_action=DROP_ACTION):
+    lines = []
+    for (value, length), hop in sorted(table.items()):
+        if hop is None:
+            if drop_action is None:
+                raise ValueError(f"{int_to_ip(value)}/{length} needs a drop entry, but no drop action was given")
+            action, params = drop_action, ()
+        else:
+            action, params = hop
+        lines.append(f"table_add {name} {action} {int_to_ip(value)}/{length} => {' '.join(params)}".rstrip())
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile host routes into the minimal equivalent LPM table")
+    parser.add_argument("routes", help="table_add lines or '<address>[/len] <params...>' lines")
+    parser.add_argument("-o", "--output", help="write the compiled table_add commands here (default: stdout)")
+    parser.add_argument("--table", default=TABLE)
+    parser.add_argument("--action", default=ACTION, help="action of routes given as plain lines")
+    parser.add_argument("--drop-action", default=DROP_ACTION, help="action of entries that must not forward")
+    parser.add_argument("--verify", action="store_true", help="check the compiled table against the input")
+    args = parser.parse_args()
+
+    with open(args.routes) as f:
+        routes = read_routes(f, args.action)
+    compiled = compile_routes(routes)
+    lines = to_commands(compiled, args.table, args.drop_action)
+    print(f"{len(routes)} routes compiled into {len(compiled)} entries", file=sys.stderr)
+    if args.verify:
+        differences = verify(routes, compiled)
+        for addr, want, got in differences[:10]:
+            print(f"{int_to_ip(addr)}: expected {want}, got {got}", file=sys.stderr)
+        print("verified: equivalent" if not differences else f"{len(differences)} differences", file=sys.stderr)
+        if differences:
+            sys.exit(1)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.writelines(line + "\n" for line in lines)
+    elif not args.verify:
+        for line in lines:
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Tests of the p4pkt field encoding: values that do not fit in a field fail to
+build, as they do with scapy.
+
+Usage:
+    python3 -m pytest test_p4pkt.py
+    python3 -m unittest test_p4pkt
+"""
+
+import unittest
+
+from p4pkt import Packet, ByteField, XByteField, ShortField, IntField, BitField
+
+LIMITS = {ByteField: 255, XByteField: 255, ShortField: 65535, IntField: 0xffffffff}
+
+
+def header(field_type):
+    class Header(Packet):
+        fields_desc = [field_type("value", 0)]
+    return Header
+
+
+class FieldRangeTest(unittest.TestCase):
+
+    def test_largest_value_builds(self):
+        for field_type, limit in LIMITS.items():
+            self.assertEqual(int.from_bytes(bytes(header(field_type)(value=limit)), "big"), limit)
+
+    def test_out_of_range_fails(self):
+        for field_type, limit in LIMITS.items():
+            for value in (limit + 1, -1):
+                with self.subTest(field=field_type.__name__, value=value), self.assertRaises(ValueError):
+                    bytes(header(field_type)(value=value))
+
+    def test_bit_field_masks(self):
+        class Bits(Packet):
+            fields_desc = [BitField("high", 0, 4), BitField("low", 0, 4)]
+        self.assertEqual(bytes(Bits(high=0x1f, low=1)), b"\xf1")
+
+
+if __name__ == '__main__':
+    unittest.main()